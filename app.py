@@ -1,13 +1,35 @@
 import streamlit as st
+import hashlib
+import html
+import logging
 import tempfile
 import os
+import uuid
 from datetime import datetime
 import pandas as pd
 
-from components.document_processor import DocumentProcessor
-from components.nlp_processor import NLPProcessor
-from components.retrieval_system import DocumentRetriever
-from components.response_generator import ResponseGenerator
+from components.chat_backend import LocalChatBackend
+from components.chat_history import ChatHistory, prune_chat_logs
+from components.metrics import metrics
+from components.namespaces import is_valid_namespace
+from components.service_client import RemoteChatBackend
+from components.settings import get_setting
+
+logging.basicConfig(level=get_setting("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+# Prometheus text exposition of the in-process metrics, rewritten after every chat turn
+METRICS_PATH = get_setting("METRICS_PATH", os.path.join("cache", "metrics.prom"))
+# When set, the app is a thin client of service.py at this URL instead of running the models itself
+SERVICE_URL = get_setting("CHAT_SERVICE_URL")
+# By default each browser session gets its own document namespace; set this to search one index shared by everyone
+SHARED_DOCUMENTS = str(get_setting("SHARED_DOCUMENTS", "0")).lower() in ("1", "true", "yes")
+# Chat transcripts are logged here, one JSON-lines file per session id; only the latest messages stay in memory.
+# Logs not written to for CHAT_HISTORY_TTL_DAYS are deleted.
+CHAT_HISTORY_DIR = get_setting("CHAT_HISTORY_DIR", os.path.join("cache", "chat_history"))
+CHAT_HISTORY_TTL_DAYS = float(get_setting("CHAT_HISTORY_TTL_DAYS", "30"))
+CHAT_BUFFER_MESSAGES = int(get_setting("CHAT_BUFFER_MESSAGES", "200"))
+# Messages shown in the chat window on each rerun; earlier ones are paged in this many at a time
+CHAT_WINDOW_MESSAGES = min(int(get_setting("CHAT_WINDOW_MESSAGES", "30")), CHAT_BUFFER_MESSAGES)
 
 st.set_page_config(
     page_title="Document AI Chatbot",
@@ -60,26 +82,51 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+def session_id():
+    """
+    This session's id: it names the document namespace and the chat log. It
+    is kept in the URL (?ns=...), so reloading or bookmarking the page finds
+    the same documents and conversation again.
+    """
+    session = st.query_params.get("ns")
+    if not session or not is_valid_namespace(session):
+        session = uuid.uuid4().hex
+        st.query_params["ns"] = session
+    return session
+
+@st.cache_resource(ttl=3600)
+def prune_old_chat_logs():
+    """Runs at most once an hour per process."""
+    return prune_chat_logs(CHAT_HISTORY_DIR, CHAT_HISTORY_TTL_DAYS * 86400)
+
 # Initialize session state
 if 'chatbot_initialized' not in st.session_state:
     st.session_state.chatbot_initialized = False
-    st.session_state.messages = []
+    prune_old_chat_logs()
+    session = session_id()
+    st.session_state.session_id = session
+    st.session_state.history = ChatHistory(os.path.join(CHAT_HISTORY_DIR, f"{session}.jsonl"),
+                                           render=lambda message: message_block_html(message),
+                                           max_buffered=CHAT_BUFFER_MESSAGES)
     st.session_state.query_count = 0
-    st.session_state.confidence_history = []
+    st.session_state.confidence_sum = 0.0
     st.session_state.processed_files = set()
+    # Uploads already looked at, so a rerun does not hash every file again
+    st.session_state.seen_uploads = set()
+    st.session_state.ingestion_jobs = []
+    # By default the session's documents are private to it
+    st.session_state.namespace = None if SHARED_DOCUMENTS else session
 
 @st.cache_resource
 def initialize_chatbot():
     """Initialize chatbot components (cached for performance)"""
     try:
-        doc_processor = DocumentProcessor()
-        nlp_processor = NLPProcessor()
-        retriever = DocumentRetriever(doc_processor.collection)
-        response_generator = ResponseGenerator()
-        return doc_processor, nlp_processor, retriever, response_generator, True
+        if SERVICE_URL:
+            return RemoteChatBackend(SERVICE_URL), True
+        return LocalChatBackend(), True
     except Exception as e:
         st.error(f"Error initializing chatbot: {str(e)}")
-        return None, None, None, None, False
+        return None, False
     
 def main():
     st.markdown("""
@@ -89,7 +136,7 @@ def main():
         </div>
     """, unsafe_allow_html=True)
 
-    doc_processor, nlp_processor, retriever, response_generator, init_success = initialize_chatbot()
+    backend, init_success = initialize_chatbot()
     if not init_success:
         st.error("Failed to initialize chatbot. Please check API keys and refresh the page.")
         return
@@ -103,7 +150,13 @@ def main():
             help="Upload PDF, DOCX, or TXT files to chat with"
         )
         if uploaded_files:
-            process_documents(uploaded_files, doc_processor)
+            process_documents(uploaded_files, backend)
+        if st.session_state.ingestion_jobs:
+            jobs = backend.jobs(st.session_state.ingestion_jobs, st.session_state.namespace)
+            if ingesting(jobs):
+                poll_ingestion_status(backend)
+            else:
+                display_ingestion_status(jobs)
         
         st.divider()
 
@@ -136,17 +189,43 @@ def main():
             st.metric("Documents", len(st.session_state.processed_files))
         with col2:
             st.metric("Queries", st.session_state.query_count)
+        try:
+            stats = backend.stats(st.session_state.namespace)
+        except Exception as e:
+            st.caption(f"Statistics unavailable: {e}")
+            stats = None
+        if stats:
+            index_scope = "the shared" if SHARED_DOCUMENTS else "this session's"
+            st.caption(f"{stats['chunks']} chunks in {index_scope} index")
         
-        if st.session_state.confidence_history:
-            avg_confidence = sum(st.session_state.confidence_history) / len(st.session_state.confidence_history)
+        if st.session_state.query_count:
+            avg_confidence = st.session_state.confidence_sum / st.session_state.query_count
             st.metric("Avg Relevance", f"{avg_confidence:.1%}")
+
+        if stats:
+            answer_stats = stats['answer_cache']
+            st.caption(f"Answer cache: {answer_stats['hit_rate']:.0%} hit rate "
+                       f"({answer_stats['hits']} hits, {answer_stats['entries']} cached answers)")
+            translation_stats = stats['translation_cache']
+            st.caption(f"Translation cache: {translation_stats['hit_rate']:.0%} hit rate "
+                       f"({translation_stats['memory_hits'] + translation_stats['disk_hits']} hits, "
+                       f"{translation_stats['misses']} misses)")
+
+            embedding_model = stats['embedding_model']
+            if embedding_model['load_seconds'] is not None:
+                st.caption(f"Embedding model ({embedding_model['backend']}) loaded in "
+                           f"{embedding_model['load_seconds']:.1f}s (warmup {embedding_model['warmup_seconds'] or 0:.2f}s)")
+
+            if stats['stages']:
+                with st.expander("⏱️ Stage latency"):
+                    st.dataframe(pd.DataFrame(stats['stages']).set_index('stage'), use_container_width=True)
         
         st.divider()
         st.header("⚡ Quick Actions")
         if st.button("Clear Chat & History", use_container_width=True):
-            st.session_state.messages = []
+            st.session_state.history.clear()
             st.session_state.query_count = 0
-            st.session_state.confidence_history = []
+            st.session_state.confidence_sum = 0.0
             st.rerun()
 
     st.header("💬 Chat Interface")
@@ -155,123 +234,166 @@ def main():
         display_chat_messages()
 
     # PASSING THE SELECTED LANGUAGE TO THE HANDLER 
-    handle_chat_input(nlp_processor, retriever, response_generator, selected_language)
-
-def process_documents(uploaded_files, doc_processor):
-    """Process uploaded documents, avoiding duplicates."""
-    with st.spinner("Processing documents... This may take a moment."):
-        new_files_processed = 0
-        total_chunks = 0
-        for uploaded_file in uploaded_files:
-            if uploaded_file.name not in st.session_state.processed_files:
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as temp_file:
-                        temp_file.write(uploaded_file.getvalue())
-                        temp_file_path = temp_file.name
-                    
-                    documents = doc_processor.process_document(temp_file_path)
-                    doc_processor.store_documents(documents)
-                    total_chunks += len(documents)
-                    st.session_state.processed_files.add(uploaded_file.name)
-                    new_files_processed += 1
-                    os.unlink(temp_file_path)
-                except Exception as e:
-                    st.error(f"Error processing {uploaded_file.name}: {str(e)}")
-        
-        if new_files_processed > 0:
-            st.success(f"Successfully processed {new_files_processed} new document(s) into {total_chunks} chunks.")
-            st.rerun()
+    handle_chat_input(chat_container, backend, selected_language)
+
+def process_documents(uploaded_files, backend):
+    """Queue uploaded documents for background ingestion, avoiding duplicates."""
+    for uploaded_file in uploaded_files:
+        # The widget keeps every upload across reruns; only new ones need hashing
+        upload_key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+        if upload_key in st.session_state.seen_uploads:
+            continue
+
+        # Dedupe on content, so a re-uploaded file with edits is picked up under the same name
+        file_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if file_hash in st.session_state.processed_files:
+            st.session_state.seen_uploads.add(upload_key)
+        else:
+            try:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as temp_file:
+                    temp_file.write(uploaded_file.getvalue())
+                    temp_file_path = temp_file.name
+
+                # The queue owns the temp file from here on and removes it once parsed. The document
+                # id includes the session, so same-named uploads in a shared namespace do not replace each other
+                job_id = backend.submit(temp_file_path, uploaded_file.name, file_hash, st.session_state.namespace,
+                                        f"{st.session_state.session_id}/{uploaded_file.name}")
+                st.session_state.ingestion_jobs.append(job_id)
+                st.session_state.processed_files.add(file_hash)
+                st.session_state.seen_uploads.add(upload_key)
+            except Exception as e:
+                st.error(f"Error queuing {uploaded_file.name}: {str(e)}")
+
+def ingesting(jobs) -> bool:
+    return any(job['status'] not in ('done', 'failed') for job in jobs)
+
+@st.fragment(run_every=2)
+def poll_ingestion_status(backend):
+    """
+    Ingestion progress that reruns on its own while documents index, so chat
+    stays usable meanwhile. Once every job has finished, one full rerun
+    replaces it with the static status and the polling stops.
+    """
+    jobs = backend.jobs(st.session_state.ingestion_jobs, st.session_state.namespace)
+    if not ingesting(jobs):
+        st.rerun()
+    display_ingestion_status(jobs)
+
+def display_ingestion_status(jobs):
+    """Per-file ingestion progress."""
+    for job in jobs:
+        if job['status'] == 'done':
+            st.caption(f"✅ {job['name']}: {job['chunks_total']} chunks "
+                       f"({job['new_chunks']} new, {job['chunks_per_sec']:.1f} chunks/sec)")
+        elif job['status'] == 'failed':
+            st.caption(f"❌ {job['name']}: {job['error']}")
+        elif job['status'] == 'embedding' and job['chunks_total']:
+            st.progress(job['chunks_done'] / job['chunks_total'],
+                        text=f"{job['name']}: embedding {job['chunks_done']}/{job['chunks_total']} chunks")
+        elif job['status'] == 'embedding':
+            # Large files are streamed page by page, so their total is only known at the end
+            st.caption(f"⏳ {job['name']}: embedded {job['chunks_done']} chunks so far...")
+        else:
+            st.progress(0.0, text=f"{job['name']}: {job['status']}...")
 
 def display_chat_messages():
-    """Display chat message history with improved styling."""
-    if not st.session_state.messages:
+    """
+    Display the latest CHAT_WINDOW_MESSAGES messages as a single block of their
+    cached HTML, so a rerun costs the same however long the chat is. Earlier
+    messages are paged in from the session's log only when asked for.
+    """
+    history = st.session_state.history
+    if not len(history):
         st.info("👋 Upload a document and start asking questions!")
         return
 
-    for message in st.session_state.messages:
-        is_user = message["role"] == "user"
-        container_class = "user-message-container" if is_user else "bot-message-container"
-        message_class = "user-message" if is_user else "bot-message"
-        
-        with st.container():
-            st.markdown(f'<div class="{container_class}">', unsafe_allow_html=True)
-            if is_user:
-                 st.markdown(f"""
-                    <div class="chat-message {message_class}">
-                            <strong>You:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                confidence_bar = ""
-                if "confidence" in message:
-                    confidence = message["confidence"] * 100
-                
-                st.markdown(f"""
-                    <div class="chat-message {message_class}">
-                        <strong>🤖 Assistant:</strong> {message['content']}
-                        {confidence_bar}
-                    </div>
-                """, unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+    earlier = len(history) - CHAT_WINDOW_MESSAGES
+    if earlier > 0:
+        display_earlier_messages(history, earlier)
+    st.markdown("".join(block for _, block in history.recent(CHAT_WINDOW_MESSAGES)), unsafe_allow_html=True)
+
+def display_earlier_messages(history, earlier: int):
+    """One page of the messages before the chat window, newest page first."""
+    if not st.toggle(f"📜 Show {earlier} earlier messages", key="show_earlier_messages"):
+        return
+    pages = -(-earlier // CHAT_WINDOW_MESSAGES)
+    page = st.number_input("Page (1 = most recent)", min_value=1, max_value=pages, value=1, step=1,
+                           key="earlier_messages_page")
+    stop = earlier - (page - 1) * CHAT_WINDOW_MESSAGES
+    messages = history.messages(max(0, stop - CHAT_WINDOW_MESSAGES), stop)
+    st.markdown("".join(message_block_html(message) for message in messages), unsafe_allow_html=True)
+    st.divider()
+
+def add_message(message):
+    """Record a message in the session's history, rendering its HTML once."""
+    st.session_state.history.append(message)
+
+def message_block_html(message) -> str:
+    """A chat message bubble inside its left/right aligned container."""
+    container_class = "user-message-container" if message["role"] == "user" else "bot-message-container"
+    return f'<div class="{container_class}">{message_html(message)}</div>'
+
+def message_html(message) -> str:
+    """
+    HTML for a single chat message bubble. The content is escaped, and the
+    markup kept on one line, so that messages can be joined into one markdown
+    block without one message's text breaking the ones after it.
+    """
+    content = html.escape(message['content']).replace("\n", "<br>")
+    if message["role"] == "user":
+        return f'<div class="chat-message user-message"><strong>You:</strong> {content}</div>'
+    return f'<div class="chat-message bot-message"><strong>🤖 Assistant:</strong> {content}</div>'
+
 
 # UPDATED FUNCTION SIGNATURES TO ACCEPT LANGUAGE 
-def handle_chat_input(nlp_processor, retriever, response_generator, language: str):
-    """Handle chat input and generate responses."""
+def handle_chat_input(chat_container, backend, language: str):
+    """Handle chat input and stream the response into the chat container as it is generated."""
     user_input = st.chat_input("Ask a question about your documents...")
 
     if user_input:
-        st.session_state.messages.append({"role": "user", "content": user_input})
-        
-        with st.spinner("🤔 Thinking..."):
+        user_message = {"role": "user", "content": user_input}
+        add_message(user_message)
+        with chat_container:
+            st.markdown(message_html(user_message), unsafe_allow_html=True)
+            placeholder = st.empty()
+            placeholder.markdown(message_html({"role": "assistant", "content": "🤔 Thinking..."}), unsafe_allow_html=True)
+
             try:
                 # Pass the selected language down to the response generation pipeline
-                response_data = generate_chatbot_response(user_input, nlp_processor, retriever, response_generator, language)
-                st.session_state.messages.append({
+                response_data = {"response": "", "confidence": 0.0}
+                streamed = ""
+                for event in backend.stream(user_input, language, st.session_state.namespace):
+                    if event['type'] == 'delta':
+                        streamed += event['text']
+                        placeholder.markdown(message_html({"role": "assistant", "content": streamed + " ▌"}),
+                                             unsafe_allow_html=True)
+                    else:
+                        response_data = event
+                add_message({
                     "role": "assistant",
                     "content": response_data["response"],
                     "confidence": response_data["confidence"]
                 })
                 st.session_state.query_count += 1
-                st.session_state.confidence_history.append(response_data["confidence"])
+                st.session_state.confidence_sum += response_data["confidence"]
             except Exception as e:
                 st.error(f"Error generating response: {str(e)}")
-                st.session_state.messages.append({
+                add_message({
                     "role": "assistant",
                     "content": "Sorry, I encountered an error. Please try again.",
                     "confidence": 0.0
                 })
+        write_metrics()
         st.rerun()
 
-# REVISED RESPONSE LOGIC FOR MULTILINGUAL FLOW
-def generate_chatbot_response(query: str, nlp_processor, retriever, response_generator, language: str):
-    """Orchestrate the full RAG pipeline for a multilingual response."""
-    
-    # 1. Translate user's query to English for searching.
-    # The source language is auto-detected. The target is our consistent pivot language, 'en-IN'.
-    english_query = nlp_processor.translate_text(query, source_lang="auto", target_lang='en-IN')
-
-    if not english_query or not english_query.strip():
-        return {"response": "I could not understand your question. Please try rephrasing.", "confidence": 0.0}
-
-    # 2. Retrieve relevant documents using the English query
-    retrieved_docs = retriever.hybrid_search(english_query, k=5)
-
-    # 3. Handle the case where no relevant documents are found
-    if not retrieved_docs:
-        not_found_message = "I couldn't find relevant information in your documents to answer that. Please try rephrasing your question."
-        # Translate the "not found" message back to the user's CHOSEN language
-        translated_not_found = nlp_processor.translate_text(not_found_message, source_lang='en-IN', target_lang=language)
-        return {"response": translated_not_found, "confidence": 0.0}
-    
-    # 4. Generate a response using the LLM. Pass the user's chosen language for the final translation step.
-    response = response_generator.generate_response(
-        english_query, retrieved_docs, nlp_processor, target_language=language
-    )
-
-    # 5. Calculate confidence based on relevance of retrieved docs
-    confidence = sum(doc.get('score', 0) for doc in retrieved_docs) / len(retrieved_docs) if retrieved_docs else 0.0
-    
-    return {"response": response, "confidence": confidence}
+def write_metrics():
+    if SERVICE_URL:
+        # The service exposes its own metrics at /metrics
+        return
+    try:
+        metrics.write_prometheus(METRICS_PATH)
+    except OSError as e:
+        logging.getLogger(__name__).warning("Could not write metrics to %s: %s", METRICS_PATH, e)
 
 if __name__ == "__main__":
     main()
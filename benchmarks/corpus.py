@@ -0,0 +1,79 @@
+import os
+import random
+from typing import Dict, Iterator, List, Tuple
+
+# Small per-language vocabularies; enough to give the tokenizer, splitter and
+# BM25 index realistic multilingual input without shipping real documents.
+VOCABULARY: Dict[str, List[str]] = {
+    "en": ("the contract warranty pump valve pressure supplier clause delivery invoice payment "
+           "shall within days notice termination maintenance inspection schedule report safety "
+           "equipment customer service period agreement liability insurance").split(),
+    "hi": ("अनुबंध वारंटी पंप दबाव आपूर्तिकर्ता खंड वितरण भुगतान दिनों सूचना समाप्ति रखरखाव "
+           "निरीक्षण अनुसूची रिपोर्ट सुरक्षा उपकरण ग्राहक सेवा अवधि समझौता दायित्व बीमा").split(),
+    "ta": ("ஒப்பந்தம் உத்தரவாதம் பம்ப் அழுத்தம் விநியோகம் கட்டணம் நாட்கள் அறிவிப்பு பராமரிப்பு "
+           "ஆய்வு அட்டவணை அறிக்கை பாதுகாப்பு உபகரணம் வாடிக்கையாளர் சேவை காலம் காப்பீடு").split(),
+    "bn": ("চুক্তি ওয়ারেন্টি পাম্প চাপ সরবরাহকারী ধারা বিতরণ অর্থপ্রদান দিন নোটিশ রক্ষণাবেক্ষণ "
+           "পরিদর্শন সময়সূচী প্রতিবেদন নিরাপত্তা সরঞ্জাম গ্রাহক সেবা মেয়াদ বীমা").split(),
+}
+
+
+def part_number(rng: random.Random) -> str:
+    return f"{rng.choice('ABCDEFGH')}{rng.choice('KLMNPQRS')}-{rng.randint(1000, 9999)}"
+
+
+def clause_id(rng: random.Random) -> str:
+    return f"{rng.randint(1, 30)}.{rng.randint(1, 12)}"
+
+
+def sentence(rng: random.Random, language: str) -> str:
+    words = rng.choices(VOCABULARY[language], k=rng.randint(8, 18))
+    # Sprinkle exact-match identifiers, the kind of terms keyword search is for
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), part_number(rng))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"clause {clause_id(rng)}")
+    terminator = "।" if language in ("hi", "bn") else "."
+    return " ".join(words) + terminator
+
+
+def paragraph(rng: random.Random, language: str) -> str:
+    return " ".join(sentence(rng, language) for _ in range(rng.randint(3, 7)))
+
+
+def generate_documents(directory: str, count: int, paragraphs_per_document: int = 60,
+                       seed: int = 7) -> List[str]:
+    """Write count synthetic .txt documents in rotating languages; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    languages = list(VOCABULARY)
+    paths = []
+    for i in range(count):
+        language = languages[i % len(languages)]
+        path = os.path.join(directory, f"synthetic_{language}_{i:04d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for _ in range(paragraphs_per_document):
+                f.write(paragraph(rng, language) + "\n\n")
+        paths.append(path)
+    return paths
+
+
+def generate_chunks(count: int, seed: int = 11) -> Iterator[Tuple[str, str]]:
+    """Yield (chunk id, chunk text) pairs for filling an index directly, without embedding."""
+    rng = random.Random(seed)
+    languages = list(VOCABULARY)
+    for i in range(count):
+        yield f"synthetic-{i}", paragraph(rng, languages[i % len(languages)])
+
+
+def generate_queries(count: int, seed: int = 13) -> List[Tuple[str, str]]:
+    """(language code for the chat, question) pairs mixing plain and exact-term questions."""
+    rng = random.Random(seed)
+    codes = {"en": "en-IN", "hi": "hi-IN", "ta": "ta-IN", "bn": "bn-IN"}
+    queries = []
+    for i in range(count):
+        language = rng.choice(list(VOCABULARY))
+        words = rng.choices(VOCABULARY[language], k=rng.randint(4, 8))
+        if i % 3 == 0:
+            words.append(part_number(rng))
+        queries.append((codes[language], " ".join(words) + "?"))
+    return queries
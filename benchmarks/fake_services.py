@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+
+ANSWER = ("According to the documents, the warranty on the pump covers defects for twelve months. "
+          "Claims must be raised within thirty days of the failure. "
+          "Part numbers and clause references are listed in the supplier agreement.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeServiceServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests += 1
+        failure = self.server.next_failure()
+        if failure is not None:
+            self._send_json(*failure)
+        elif self.path.rstrip("/").endswith("/translate"):
+            self._translate(body)
+        else:
+            self._generate(body)
+
+    def _send_json(self, payload, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _translate(self, body: Dict):
+        """Stand-in for Sarvam's POST /translate; tags the text instead of translating it."""
+        time.sleep(self.server.latencies["translate"])
+        target = body.get("target_language_code", "en-IN")
+        text = body.get("input", "")
+        self._send_json({
+            "request_id": uuid.uuid4().hex,
+            "translated_text": text if target == "en-IN" else f"[{target}] {text}",
+            "source_language_code": body.get("source_language_code") if body.get("source_language_code") != "auto" else "en-IN",
+        })
+
+    def _generate(self, body: Dict):
+        """Stand-in for the HF Inference API, streaming TGI-style server-sent events when asked to."""
+        time.sleep(self.server.latencies["llm_first_token"])
+        tokens = [word + " " for word in ANSWER.split(" ")]
+        if not body.get("stream"):
+            time.sleep(self.server.latencies["llm_token"] * len(tokens))
+            self._send_json([{"generated_text": ANSWER}])
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            time.sleep(self.server.latencies["llm_token"])
+            event = {"token": {"id": i, "text": token, "logprob": 0.0, "special": False},
+                     "generated_text": ANSWER if i == len(tokens) - 1 else None}
+            data = f"data:{json.dumps(event)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latencies: Dict[str, float]):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latencies = latencies
+        self.requests = 0
+        self._failures = deque()
+        self._failures_lock = threading.Lock()
+
+    def fail_next(self, status: int, payload: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None,
+                  times: int = 1):
+        """Answer the next `times` requests with this error instead of serving them, e.g. to exercise retries."""
+        with self._failures_lock:
+            self._failures.extend([(payload or {"error": f"injected {status}"}, status, headers)] * times)
+
+    def next_failure(self):
+        with self._failures_lock:
+            return self._failures.popleft() if self._failures else None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+@contextmanager
+def run_fake_services(llm_first_token: float = 0.5, llm_token: float = 0.02,
+                      translate: float = 0.15) -> Iterator[FakeServiceServer]:
+    """
+    Serve stand-ins for the HF Inference API and Sarvam translate on one local
+    port, with the given latencies in seconds, and point the components at it
+    through the settings environment variables for the duration of the block.
+    """
+    server = FakeServiceServer({"llm_first_token": llm_first_token, "llm_token": llm_token, "translate": translate})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    overrides = {
+        "HF_API_URL": f"{server.url}/models/fake-llm",
+        "HF_TOKEN": "benchmark",
+        # Size the prompt by estimate rather than downloading the real model's tokenizer
+        "HF_TOKENIZER": "",
+        "SARVAM_BASE_URL": server.url,
+        "SARVAM_API_KEY": "benchmark",
+    }
+    previous = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        yield server
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        server.shutdown()
+        server.server_close()
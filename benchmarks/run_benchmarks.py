@@ -0,0 +1,285 @@
+"""
+Offline benchmarks for ingestion, retrieval and full chat turns.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --sizes 10000,100000 --baseline results.json
+
+The LLM and translation calls go to local stand-in servers (see
+fake_services.py), so numbers reflect this code plus the configured fake
+latencies, not the real providers. With --baseline, latencies that got worse
+than the tolerance allows are listed and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.corpus import generate_chunks, generate_documents, generate_queries
+from benchmarks.fake_services import run_fake_services
+
+DEFAULT_SIZES = "10000,100000,1000000"
+INSERT_BATCH_SIZE = 5000
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """Percentiles in milliseconds."""
+    values = np.asarray(samples) * 1000
+    return {
+        'count': len(samples),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def timed(fn: Callable, samples: List[float]):
+    start = time.perf_counter()
+    result = fn()
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def bench_ingest(work_dir: str, document_count: int, backend: str) -> Dict:
+    """Chunk/embed (process_document) and store (store_documents) throughput on the synthetic corpus."""
+    from components.document_processor import DocumentProcessor
+
+    paths = generate_documents(os.path.join(work_dir, "corpus"), document_count)
+    processor = DocumentProcessor(persist_directory=os.path.join(work_dir, "ingest_db"), vector_backend=backend)
+    processor.embedding_model.warmup()
+
+    chunks, process_seconds, store_seconds = 0, 0.0, 0.0
+    for path in paths:
+        start = time.perf_counter()
+        documents = processor.process_document(path)
+        processed = time.perf_counter()
+        processor.store_documents(documents)
+        store_seconds += time.perf_counter() - processed
+        process_seconds += processed - start
+        chunks += len(documents)
+
+    total = process_seconds + store_seconds
+    return {
+        'documents': len(paths),
+        'chunks': chunks,
+        'process_seconds': process_seconds,
+        'store_seconds': store_seconds,
+        'chunks_per_sec': chunks / total if total else 0.0,
+        'process_chunks_per_sec': chunks / process_seconds if process_seconds else 0.0,
+        'store_chunks_per_sec': chunks / store_seconds if store_seconds else 0.0,
+        'processor': processor,
+    }
+
+
+def bench_retrieval(work_dir: str, sizes: List[int], query_count: int, backend: str, k: int = 5) -> Dict:
+    """
+    Search latency at each corpus size. The index is filled directly with
+    random unit vectors (embedding millions of chunks would dominate the run),
+    growing from one size to the next; queries use real query embeddings,
+    which are timed separately, so the search numbers isolate the index.
+    """
+    from components.embedding_model import get_embedding_model
+    from components.keyword_index import BM25Index
+    from components.retrieval_system import DocumentRetriever
+    from components.vector_index import make_vector_index
+
+    model = get_embedding_model()
+    queries = [query for _, query in generate_queries(query_count)]
+    embed_samples = []
+    query_embeddings = [timed(lambda q=q: model.encode(q), embed_samples) for q in queries]
+    dimension = len(query_embeddings[0])
+
+    vector_index = make_vector_index(os.path.join(work_dir, "retrieval_db"), backend)
+    keyword_index = BM25Index()
+    retriever = DocumentRetriever(vector_index, keyword_index)
+    rng = np.random.default_rng(3)
+    chunk_source = generate_chunks(max(sizes))
+
+    results = {'embed_query': latency_summary(embed_samples), 'sizes': {}}
+    stored = 0
+    for size in sorted(sizes):
+        start = time.perf_counter()
+        while stored < size:
+            count = min(INSERT_BATCH_SIZE, size - stored)
+            ids, texts = zip(*(next(chunk_source) for _ in range(count)))
+            vectors = rng.standard_normal((count, dimension), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            vector_index.upsert(list(ids), vectors, list(texts), [{'source': 'synthetic.txt'}] * count)
+            keyword_index.add(list(ids), list(texts))
+            stored += count
+        fill_seconds = time.perf_counter() - start
+
+        similarity_samples, hybrid_samples = [], []
+        for query, embedding in zip(queries, query_embeddings):
+            timed(lambda: retriever.similarity_search(query, k, query_embedding=embedding), similarity_samples)
+            timed(lambda: retriever.hybrid_search(query, k, query_embedding=embedding), hybrid_samples)
+        results['sizes'][str(size)] = {
+            'fill_seconds': fill_seconds,
+            'similarity_search': latency_summary(similarity_samples),
+            'hybrid_search': latency_summary(hybrid_samples),
+        }
+        print(f"retrieval @ {size}: hybrid p95 {results['sizes'][str(size)]['hybrid_search']['p95_ms']:.1f} ms")
+    return results
+
+
+def bench_turns(processor, turn_count: int, warm_caches: bool, latencies: Dict[str, float]) -> Dict:
+    """
+    End-to-end chat turns against the ingested corpus and the stand-in services.
+    Turns go through stream_chatbot_response, as the app's are, so time to
+    the first visible text is measured alongside the total.
+    """
+    from components.answer_cache import SemanticAnswerCache
+    from components.chat_pipeline import stream_chatbot_response
+    from components.nlp_processor import NLPProcessor
+    from components.response_generator import ResponseGenerator
+    from components.retrieval_system import DocumentRetriever
+    from components.translation_cache import TranslationCache
+
+    with run_fake_services(**latencies) as server:
+        if warm_caches:
+            translation_cache = TranslationCache(path=None)
+            answer_cache = SemanticAnswerCache(version_getter=lambda: processor.version)
+        else:
+            # No memory budget and an unreachable similarity threshold: every turn pays full price
+            translation_cache = TranslationCache(path=None, max_memory_bytes=0)
+            answer_cache = SemanticAnswerCache(version_getter=lambda: processor.version, threshold=2.0)
+        nlp_processor = NLPProcessor(cache=translation_cache)
+        retriever = DocumentRetriever(processor.vector_index, processor.keyword_index)
+        response_generator = ResponseGenerator()
+
+        first_delta_samples, turn_samples, by_language = [], [], {}
+        for language, query in generate_queries(turn_count):
+            start = time.perf_counter()
+            first_delta = None
+            for event in stream_chatbot_response(query, nlp_processor, retriever, response_generator,
+                                                 answer_cache, language):
+                if first_delta is None and event['type'] == 'delta':
+                    first_delta = time.perf_counter() - start
+            elapsed = time.perf_counter() - start
+            turn_samples.append(elapsed)
+            first_delta_samples.append(first_delta if first_delta is not None else elapsed)
+            by_language.setdefault(language, []).append(elapsed)
+
+        return {
+            'warm_caches': warm_caches,
+            'fake_latencies': latencies,
+            'upstream_requests': server.requests,
+            'turn': latency_summary(turn_samples),
+            'first_delta': latency_summary(first_delta_samples),
+            'turn_by_language': {language: latency_summary(samples) for language, samples in by_language.items()},
+        }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Latency percentiles (lower is better) and throughputs (higher is better) that regressed beyond tolerance."""
+    regressions = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if key not in previous:
+                continue
+            if isinstance(value, dict) and isinstance(previous[key], dict):
+                walk(value, previous[key], f"{path}.{key}" if path else key)
+            elif isinstance(value, (int, float)) and previous[key]:
+                if key.endswith(('p95_ms', 'p99_ms')) and value > previous[key] * (1 + tolerance):
+                    regressions.append(f"{path}.{key}: {previous[key]:.1f} -> {value:.1f}")
+                elif key.endswith('per_sec') and value < previous[key] * (1 - tolerance):
+                    regressions.append(f"{path}.{key}: {previous[key]:.1f} -> {value:.1f}")
+
+    walk(results, baseline, "")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--backend", default="chroma", help="vector index backend: chroma, float16 or int8")
+    parser.add_argument("--embedding-backend", help="EMBEDDING_BACKEND to use: torch, int8 or onnx")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated retrieval corpus sizes, in chunks")
+    parser.add_argument("--documents", type=int, default=8, help="synthetic documents to ingest")
+    parser.add_argument("--queries", type=int, default=200, help="queries per retrieval size")
+    parser.add_argument("--turns", type=int, default=30, help="full chat turns")
+    parser.add_argument("--warm-caches", action="store_true", help="let translation and answer caches hit")
+    parser.add_argument("--llm-first-token", type=float, default=0.5, help="fake LLM seconds to first token")
+    parser.add_argument("--llm-token", type=float, default=0.02, help="fake LLM seconds per token")
+    parser.add_argument("--translate", type=float, default=0.15, help="fake translation seconds per call")
+    parser.add_argument("--skip", default="", help="comma separated sections to skip: ingest,retrieval,turns")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+    skip = set(filter(None, args.skip.split(",")))
+    if args.embedding_backend:
+        os.environ["EMBEDDING_BACKEND"] = args.embedding_backend
+
+    results = {
+        'meta': {
+            'started_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        }
+    }
+    work_dir = tempfile.mkdtemp(prefix="docchat-bench-")
+    try:
+        processor = None
+        if "ingest" not in skip or "turns" not in skip:
+            ingest = bench_ingest(work_dir, args.documents, args.backend)
+            processor = ingest.pop('processor')
+            results['ingest'] = ingest
+            print(f"ingest: {ingest['chunks']} chunks at {ingest['chunks_per_sec']:.1f} chunks/s")
+        if "retrieval" not in skip:
+            sizes = [int(size) for size in args.sizes.split(",") if size]
+            results['retrieval'] = bench_retrieval(work_dir, sizes, args.queries, args.backend)
+        if "turns" not in skip:
+            latencies = {'llm_first_token': args.llm_first_token, 'llm_token': args.llm_token,
+                         'translate': args.translate}
+            results['turns'] = bench_turns(processor, args.turns, args.warm_caches, latencies)
+            print(f"turns: p95 {results['turns']['turn']['p95_ms']:.0f} ms, "
+                  f"first text p95 {results['turns']['first_delta']['p95_ms']:.0f} ms")
+        from components.embedding_model import get_embedding_model
+        from components.metrics import metrics
+        model = get_embedding_model()
+        results['meta']['embedding_backend'] = model.active_backend
+        results['meta']['embedding_parity'] = model.parity
+        # Per-stage breakdown of everything above, to see which stage moved when a total regresses
+        results['stages'] = {row.pop('stage'): row for row in metrics.stage_summary()}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
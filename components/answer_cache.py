@@ -0,0 +1,125 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+
+# Part numbers, clause ids, amounts: tokens with a digit in them. Embeddings barely
+# tell "clause 4.2" from "clause 4.3", so these must match exactly for a hit.
+IDENTIFIER_PATTERN = re.compile(r"[\w./-]*\d[\w./-]*")
+
+
+def identifiers(text: str) -> FrozenSet[str]:
+    return frozenset(token.strip("./-").lower() for token in IDENTIFIER_PATTERN.findall(text))
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final answers keyed by query embedding and response language.
+
+    A lookup hits when a cached query of the same language has cosine
+    similarity >= threshold with the new one and the same identifier tokens
+    (see identifiers()). Entries expire after ttl_seconds,
+    the least recently used entry is evicted beyond max_entries, and the whole
+    cache is dropped whenever version_getter() reports a different corpus
+    version than the one the entries were answered against. lookup() returns
+    the version it saw; store() only keeps the answer if the corpus has not
+    changed since, so answers retrieved mid-ingestion are never cached.
+    """
+
+    def __init__(self, version_getter: Callable[[], int], threshold: float = 0.95,
+                 max_entries: int = 512, ttl_seconds: float = 3600):
+        self.version_getter = version_getter
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_stores = 0
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_key = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def lookup(self, query_embedding: np.ndarray, language: str, query: str) -> Tuple[Optional[Dict], int]:
+        """
+        Return ({'response', 'confidence'} of a similar cached query, or None)
+        and the corpus version, to be passed to store() with a fresh answer.
+        """
+        embedding = self._normalize(query_embedding)
+        query_identifiers = identifiers(query)
+        with self._lock:
+            version = self._check_version()
+            self._expire()
+            best_key, best_similarity = None, self.threshold
+            for key, entry in self._entries.items():
+                if entry['language'] != language or entry['identifiers'] != query_identifiers:
+                    continue
+                similarity = float(entry['embedding'] @ embedding)
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None:
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return {'response': entry['response'], 'confidence': entry['confidence']}, version
+
+    def store(self, query_embedding: np.ndarray, language: str, query: str, response: str,
+              confidence: float, version: int):
+        """Cache an answer retrieved at version (from lookup()); dropped if the corpus changed since."""
+        with self._lock:
+            if self._check_version() != version:
+                self.stale_stores += 1
+                return
+            self._entries[self._next_key] = {
+                'embedding': self._normalize(query_embedding),
+                'identifiers': identifiers(query),
+                'language': language,
+                'response': response,
+                'confidence': confidence,
+                'created': time.monotonic(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'invalidations': self.invalidations,
+            'stale_stores': self.stale_stores,
+        }
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / (np.linalg.norm(embedding) + 1e-12)
+
+    def _check_version(self) -> int:
+        version = self.version_getter()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self._version = version
+        return version
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, entry in self._entries.items() if entry['created'] < cutoff]
+        for key in expired:
+            del self._entries[key]
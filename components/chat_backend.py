@@ -0,0 +1,104 @@
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from .answer_cache import SemanticAnswerCache
+from .chat_pipeline import NOT_FOUND_MESSAGE, PIVOT_LANGUAGE, astream_chatbot_response, stream_chatbot_response
+from .embedding_model import get_embedding_model
+from .ingestion_worker import IngestionQueue
+from .metrics import metrics
+from .namespaces import NamespaceManager
+from .nlp_processor import NLPProcessor
+from .response_generator import ResponseGenerator
+from .settings import get_setting
+
+
+class LocalChatBackend:
+    """
+    Everything a chat front end needs, running in this process: background
+    ingestion, streamed answers and stats. The Streamlit app uses it directly,
+    and service.py exposes the same calls over HTTP (see service_client).
+
+    Documents and answers are scoped to a namespace (a tenant or session);
+    calls without one use the shared index. A namespace is only created by
+    its first upload: reading one that does not exist finds no documents.
+    """
+
+    def __init__(self, batching: bool = False):
+        # Loading and warming up the shared model here moves the load and
+        # first-encode cost out of the first user query.
+        self.embedding_model = get_embedding_model()
+        self.embedding_model.warmup()
+        self.namespaces = NamespaceManager(
+            max_open=int(get_setting("NAMESPACE_MAX_OPEN", "32")),
+            max_resident_chunks=int(get_setting("NAMESPACE_MAX_CHUNKS", "500000")),
+            batching=batching,
+            max_idle_seconds=float(get_setting("NAMESPACE_TTL_DAYS", "30")) * 86400,
+        )
+        self.nlp_processor = NLPProcessor()
+        self.response_generator = ResponseGenerator()
+        self.ingestion_queue = IngestionQueue(self.namespaces)
+        metrics.register_collector("translation_cache", self.nlp_processor.cache.stats)
+        metrics.register_collector("namespaces", self.namespaces.stats)
+
+    def submit(self, file_path: str, source_name: str, file_hash: str, namespace: Optional[str] = None,
+               document_id: Optional[str] = None) -> str:
+        """Queue a file for ingestion, taking ownership of file_path; returns the job id."""
+        return self.ingestion_queue.submit(file_path, source_name, file_hash, namespace, document_id)
+
+    def jobs(self, job_ids: Optional[List[str]] = None, namespace: Optional[str] = None) -> List[Dict]:
+        """The given jobs, or all jobs of namespace."""
+        if job_ids is None:
+            return self.ingestion_queue.namespace_jobs(namespace)
+        return [job for job in self.ingestion_queue.jobs(job_ids) if job['namespace'] == namespace]
+
+    def stream(self, query: str, language: str, namespace: Optional[str] = None) -> Iterator[Dict]:
+        if not self.namespaces.exists(namespace):
+            yield from self._no_documents(language)
+            return
+        with self.namespaces.use(namespace) as scope:
+            yield from stream_chatbot_response(query, self.nlp_processor, scope.retriever, self.response_generator,
+                                               scope.answer_cache, language)
+
+    async def astream(self, query: str, language: str, namespace: Optional[str] = None) -> AsyncIterator[Dict]:
+        if not self.namespaces.exists(namespace):
+            for event in await asyncio.to_thread(lambda: list(self._no_documents(language))):
+                yield event
+            return
+        # Opening a namespace loads its indexes, so keep that off the event loop
+        scope = await asyncio.to_thread(self.namespaces.acquire, namespace)
+        try:
+            async for event in astream_chatbot_response(query, self.nlp_processor, scope.retriever,
+                                                        self.response_generator, scope.answer_cache, language):
+                yield event
+        finally:
+            self.namespaces.release(scope)
+
+    def stats(self, namespace: Optional[str] = None) -> Dict:
+        if self.namespaces.exists(namespace):
+            with self.namespaces.use(namespace) as scope:
+                chunks = scope.chunks
+                answer_cache = scope.answer_cache.stats()
+        else:
+            chunks = 0
+            answer_cache = SemanticAnswerCache(version_getter=lambda: 0).stats()
+        return {
+            'chunks': chunks,
+            'answer_cache': answer_cache,
+            'translation_cache': self.nlp_processor.cache.stats(),
+            'embedding_model': {
+                'backend': self.embedding_model.active_backend,
+                'load_seconds': self.embedding_model.load_seconds,
+                'warmup_seconds': self.embedding_model.warmup_seconds,
+            },
+            'namespaces': self.namespaces.stats(),
+            'stages': metrics.stage_summary(),
+        }
+
+    def _no_documents(self, language: str) -> Iterator[Dict]:
+        message = self.nlp_processor.translate_text(NOT_FOUND_MESSAGE, language, PIVOT_LANGUAGE)
+        yield {'type': 'delta', 'text': message}
+        yield {'type': 'final', 'response': message, 'confidence': 0.0}
+
+    def close(self):
+        self.ingestion_queue.shutdown()
+        self.namespaces.close()
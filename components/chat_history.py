@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import time
+from array import array
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChatHistory:
+    """
+    One session's chat messages, with memory that does not grow with the
+    conversation.
+
+    Every message is appended to a JSON-lines log as it arrives, and only the
+    latest max_buffered stay in memory, each next to its HTML from render() so
+    a rerun does not render it again. Older messages are read back from the
+    log a page at a time, by byte offset, so a page costs the same however
+    long the conversation is. Opening an existing log resumes it.
+    """
+
+    def __init__(self, log_path: str, render: Callable[[Dict], str], max_buffered: int = 200):
+        self.log_path = log_path
+        self.render = render
+        self.max_buffered = max_buffered
+        self._buffer: "deque[Tuple[Dict, str]]" = deque(maxlen=max_buffered)
+        # Byte offset of every logged message, 8 bytes each
+        self._offsets = array('Q')
+        if os.path.exists(log_path):
+            self._resume()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, message: Dict):
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with open(self.log_path, 'ab') as f:
+            self._offsets.append(f.seek(0, os.SEEK_END))
+            f.write((json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8'))
+        self._buffer.append((message, self.render(message)))
+
+    def recent(self, count: int) -> List[Tuple[Dict, str]]:
+        """The last count buffered (message, html) pairs, oldest first."""
+        count = min(count, len(self._buffer))
+        return [self._buffer[i] for i in range(len(self._buffer) - count, len(self._buffer))]
+
+    def messages(self, start: int, stop: int) -> List[Dict]:
+        """Messages start..stop-1 in conversation order, from memory where buffered and the log otherwise."""
+        start, stop = max(0, start), min(stop, len(self))
+        first_buffered = len(self) - len(self._buffer)
+        logged = []
+        if start < min(stop, first_buffered):
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._offsets[start])
+                logged = [json.loads(f.readline()) for _ in range(start, min(stop, first_buffered))]
+        buffered = [self._buffer[i - first_buffered][0] for i in range(max(start, first_buffered), stop)]
+        return logged + buffered
+
+    def clear(self):
+        self._buffer.clear()
+        self._offsets = array('Q')
+        try:
+            os.unlink(self.log_path)
+        except OSError:
+            pass
+
+    def _resume(self):
+        offset = 0
+        truncated = False
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                try:
+                    message = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    message = None
+                if message is None:
+                    truncated = True
+                    break
+                self._offsets.append(offset)
+                self._buffer.append((message, None))
+                offset += len(line)
+        if truncated:
+            # A write cut short by a crash; everything before it is intact. Cut the
+            # partial line off, or the next append would be glued onto it.
+            logger.warning("Dropping a truncated line at the end of %s", self.log_path)
+            os.truncate(self.log_path, offset)
+        self._buffer = deque(((message, self.render(message)) for message, _ in self._buffer),
+                             maxlen=self.max_buffered)
+
+
+def prune_chat_logs(directory: str, max_age_seconds: float) -> int:
+    """Delete chat logs in directory that have not been written to for max_age_seconds."""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff:
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
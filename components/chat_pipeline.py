@@ -0,0 +1,258 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from .answer_cache import SemanticAnswerCache
+from .metrics import metrics, span
+from .nlp_processor import NLPProcessor
+from .response_generator import GenerationError, ResponseGenerator
+from .retrieval_system import DocumentRetriever
+
+PIVOT_LANGUAGE = 'en-IN'
+# Chunks retrieved per question; the context builder keeps what fits the LLM's token budget
+RETRIEVAL_K = 8
+NOT_UNDERSTOOD_MESSAGE = "I could not understand your question. Please try rephrasing."
+NOT_FOUND_MESSAGE = "I couldn't find relevant information in your documents to answer that. Please try rephrasing your question."
+
+# A sentence ends at terminal punctuation (including the Devanagari danda) followed by whitespace, or at a line break.
+# The boundary is captured so translated sentences keep the paragraph and list breaks between them.
+SENTENCE_BOUNDARY = re.compile(r"((?<=[.!?।])\s+|\n+)")
+
+_DONE = object()
+
+# An LLM token stream occupies a thread for the whole generation. Streams get a pool of
+# their own, so they never starve the default executor that translation and embedding use.
+_stream_executor: Optional[ThreadPoolExecutor] = None
+_stream_executor_lock = threading.Lock()
+
+
+def set_stream_concurrency(max_streams: int):
+    """Size the token-stream pool for the number of answers that may be generated at once (default 32)."""
+    global _stream_executor
+    with _stream_executor_lock:
+        previous = _stream_executor
+        _stream_executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="llm-stream")
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def _get_stream_executor() -> ThreadPoolExecutor:
+    if _stream_executor is None:
+        set_stream_concurrency(32)
+    return _stream_executor
+
+
+async def astream_chatbot_response(query: str, nlp_processor: NLPProcessor, retriever: DocumentRetriever,
+                                   response_generator: ResponseGenerator, answer_cache: SemanticAnswerCache,
+                                   language: str) -> AsyncIterator[Dict]:
+    """
+    Run the multilingual RAG pipeline for one question, yielding
+    {'type': 'delta', 'text': ...} events as the answer is produced and a last
+    {'type': 'final', 'response': ..., 'confidence': ...} event.
+
+    The query translation and the query embedding run concurrently: the
+    embedding model is multilingual, so the original-language embedding drives
+    the answer cache and vector search, while the English translation feeds
+    keyword search and the LLM. A cached answer is returned as soon as the
+    embedding is ready, without waiting for the translation. Generated tokens
+    are streamed; for non-English answers each completed sentence is
+    translated while later tokens are still being generated.
+
+    The whole turn and the time to its first text are recorded as the "turn"
+    and "turn_first_delta" stages; the components record their own stages.
+    """
+    start_time = time.perf_counter()
+    first_delta = True
+    ok = False
+    try:
+        async for event in _answer_events(query, nlp_processor, retriever, response_generator,
+                                          answer_cache, language):
+            if first_delta and event['type'] == 'delta':
+                metrics.observe("turn_first_delta", time.perf_counter() - start_time)
+                first_delta = False
+            yield event
+        ok = True
+    finally:
+        metrics.observe("turn", time.perf_counter() - start_time, ok)
+
+
+async def _answer_events(query: str, nlp_processor: NLPProcessor, retriever: DocumentRetriever,
+                         response_generator: ResponseGenerator, answer_cache: SemanticAnswerCache,
+                         language: str) -> AsyncIterator[Dict]:
+    translation = asyncio.ensure_future(
+        asyncio.to_thread(_timed, "translate_in", nlp_processor.translate_text, query, PIVOT_LANGUAGE, "auto")
+    )
+    try:
+        query_embedding = await asyncio.to_thread(retriever.embed_query, query)
+        cached, corpus_version = answer_cache.lookup(query_embedding, language, query)
+        # Only a miss needs the English query
+        english_query = await translation if cached is None else None
+    finally:
+        translation.cancel()
+
+    if cached is not None:
+        yield {'type': 'delta', 'text': cached['response']}
+        yield _final(cached['response'], cached['confidence'])
+        return
+
+    if not english_query or not english_query.strip():
+        yield {'type': 'delta', 'text': NOT_UNDERSTOOD_MESSAGE}
+        yield _final(NOT_UNDERSTOOD_MESSAGE, 0.0)
+        return
+
+    retrieved_docs = await asyncio.to_thread(
+        _timed, "retrieval", retriever.hybrid_search, english_query, RETRIEVAL_K, query_embedding=query_embedding
+    )
+    if not retrieved_docs:
+        message = await asyncio.to_thread(
+            _timed, "translate_out", nlp_processor.translate_text, NOT_FOUND_MESSAGE, language, PIVOT_LANGUAGE
+        )
+        yield {'type': 'delta', 'text': message}
+        yield _final(message, 0.0)
+        return
+
+    confidence = sum(doc.get('score', 0) for doc in retrieved_docs) / len(retrieved_docs)
+    tokens = _iterate_in_thread(lambda: response_generator.stream_response(english_query, retrieved_docs))
+    translated = _translate_stream(tokens, nlp_processor, language)
+    parts = []
+    try:
+        async for text in translated:
+            parts.append(text)
+            yield {'type': 'delta', 'text': text}
+    except GenerationError as e:
+        # Failures are shown to the user but never cached
+        message = str(e)
+        if language != PIVOT_LANGUAGE:
+            message = await asyncio.to_thread(nlp_processor.translate_text, message, language, PIVOT_LANGUAGE)
+        if parts:
+            message = "\n\n" + message
+        yield {'type': 'delta', 'text': message}
+        yield _final("".join(parts) + message, 0.0)
+        return
+    finally:
+        # If our consumer left early, this stops the worker thread reading the LLM stream
+        await translated.aclose()
+        await tokens.aclose()
+
+    response = "".join(parts).strip()
+    if not response:
+        response = "I could not generate a response based on the provided documents."
+        yield {'type': 'delta', 'text': response}
+        yield _final(response, confidence)
+        return
+
+    answer_cache.store(query_embedding, language, query, response, confidence, corpus_version)
+    yield _final(response, confidence)
+
+
+async def _translate_stream(tokens: AsyncIterator[str], nlp_processor: NLPProcessor,
+                            language: str) -> AsyncIterator[str]:
+    """Pass English tokens through, or translate them sentence by sentence, keeping sentence order."""
+    if language == PIVOT_LANGUAGE:
+        async for token in tokens:
+            yield token
+        return
+
+    buffer = ""
+    # (whitespace to put before it, translation) per sentence, in order
+    pending = deque()
+    separator = ""
+    started = False
+
+    def translate(sentence: str):
+        return asyncio.ensure_future(
+            asyncio.to_thread(_timed, "translate_out", nlp_processor.translate_text, sentence, language, PIVOT_LANGUAGE)
+        )
+
+    async for token in tokens:
+        buffer += token
+        *parts, buffer = SENTENCE_BOUNDARY.split(buffer)
+        for sentence, boundary in zip(parts[::2], parts[1::2]):
+            if sentence.strip():
+                pending.append((separator if started else "", translate(sentence.strip())))
+                separator, started = "", True
+            separator += boundary
+        while pending and pending[0][1].done():
+            before, translation = pending.popleft()
+            yield before + translation.result()
+
+    if buffer.strip():
+        pending.append((separator if started else "", translate(buffer.strip())))
+    while pending:
+        before, translation = pending.popleft()
+        yield before + await translation
+
+
+async def _iterate_in_thread(factory: Callable[[], Iterator]) -> AsyncIterator:
+    """
+    Drive a blocking iterator on a worker thread and hand its items to the
+    event loop. If the consumer stops early, the worker stops at the next item
+    and closes the iterator, so a generator's cleanup (e.g. closing the
+    upstream response) runs instead of the stream being read to the end.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The consumer went away and its loop is closed; nobody is listening any more
+            return False
+        return True
+
+    def run():
+        items = None
+        try:
+            items = factory()
+            for item in items:
+                if stop.is_set() or not put(item):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(_DONE, e)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    worker = loop.run_in_executor(_get_stream_executor(), run)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                await worker
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _timed(stage: str, fn: Callable, *args, **kwargs):
+    with span(stage):
+        return fn(*args, **kwargs)
+
+
+def _final(response: str, confidence: float) -> Dict:
+    return {'type': 'final', 'response': response, 'confidence': confidence}
+
+
+def stream_chatbot_response(*args, **kwargs) -> Iterator[Dict]:
+    """Synchronous view of astream_chatbot_response, for callers without an event loop (e.g. Streamlit)."""
+    loop = asyncio.new_event_loop()
+    events = astream_chatbot_response(*args, **kwargs)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
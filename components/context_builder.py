@@ -0,0 +1,136 @@
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token in characters, for when the LLM's tokenizer is unavailable
+CHARS_PER_TOKEN = 4
+# Longest chunk overlap looked for when chunks carry no start_index (stored before it was recorded)
+MAX_TEXT_OVERLAP = 1000
+MIN_TEXT_OVERLAP = 20
+
+
+def make_token_counter(tokenizer_name: Optional[str], token: Optional[str] = None) -> Callable[[str], int]:
+    """
+    Count tokens with the named Hugging Face tokenizer, or estimate them from
+    the text length if no name is given or the tokenizer cannot be loaded
+    (e.g. gated or offline).
+    """
+    if tokenizer_name:
+        try:
+            from .tokenizer import get_tokenizer
+            tokenizer = get_tokenizer(tokenizer_name, token)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        except Exception as e:
+            logger.warning("Tokenizer %s unavailable (%s); estimating tokens as %d characters each, "
+                           "so the context may not fit the model's budget", tokenizer_name, e, CHARS_PER_TOKEN)
+    return lambda text: (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def merge_adjacent(docs: List[Dict]) -> List[Dict]:
+    """
+    Merge chunks of the same source and page that overlap or touch, so text
+    shared by neighbouring chunks appears once. Positions come from the
+    splitter's start_index; without it, chunks are joined where the end of one
+    repeats the start of the other. A merged block keeps the best score of its
+    chunks. Returned in no particular order.
+    """
+    groups: Dict[tuple, List[Dict]] = {}
+    for doc in docs:
+        metadata = doc.get('metadata') or {}
+        groups.setdefault((metadata.get('source'), metadata.get('page')), []).append(doc)
+
+    blocks = []
+    for group in groups.values():
+        positioned = sorted((doc for doc in group if _start(doc) is not None), key=_start)
+        blocks.extend(_merge_positioned(positioned))
+        blocks.extend(_merge_by_text([doc for doc in group if _start(doc) is None]))
+    return blocks
+
+
+def _start(doc: Dict) -> Optional[int]:
+    start = (doc.get('metadata') or {}).get('start_index')
+    return int(start) if start is not None and int(start) >= 0 else None
+
+
+def _score(doc: Dict) -> float:
+    return doc.get('rrf_score', doc.get('score', 0.0))
+
+
+def _merge_positioned(docs: List[Dict]) -> List[Dict]:
+    blocks = []
+    current, current_end = None, None
+    for doc in docs:
+        start = _start(doc)
+        # A gap of a character or two is the whitespace the splitter stripped between chunks
+        if current is not None and start <= current_end + 2:
+            end = start + len(doc['content'])
+            if end > current_end:
+                tail = doc['content'][max(0, current_end - start):]
+                joiner = " " if start > current_end else ""
+                current['content'] += joiner + tail
+                current_end = end
+            current['score'] = max(current['score'], _score(doc))
+            continue
+        if current is not None:
+            blocks.append(current)
+        current = {'content': doc['content'], 'metadata': doc.get('metadata') or {}, 'score': _score(doc)}
+        current_end = start + len(doc['content'])
+    if current is not None:
+        blocks.append(current)
+    return blocks
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right (0 if shorter than MIN_TEXT_OVERLAP)."""
+    for size in range(min(len(left), len(right), MAX_TEXT_OVERLAP), MIN_TEXT_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_by_text(docs: List[Dict]) -> List[Dict]:
+    blocks = [{'content': doc['content'], 'metadata': doc.get('metadata') or {}, 'score': _score(doc)}
+              for doc in docs]
+    merged = True
+    while merged and len(blocks) > 1:
+        merged = False
+        for i, left in enumerate(blocks):
+            for j, right in enumerate(blocks):
+                if i == j:
+                    continue
+                if right['content'] in left['content']:
+                    overlap = len(right['content'])
+                    content = left['content']
+                else:
+                    overlap = _text_overlap(left['content'], right['content'])
+                    content = left['content'] + right['content'][overlap:]
+                if overlap:
+                    left['content'] = content
+                    left['score'] = max(left['score'], right['score'])
+                    del blocks[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return blocks
+
+
+def pack_context(docs: List[Dict], max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """
+    Build the LLM context from retrieved chunks within max_tokens: merge
+    overlapping neighbours, then take blocks best score first, skipping any
+    that no longer fit rather than stopping at the first one.
+    """
+    parts = []
+    used = 0
+    for block in sorted(merge_adjacent(docs), key=lambda block: block['score'], reverse=True):
+        source = block['metadata'].get('source', 'Unknown')
+        part = f"Source: {os.path.basename(source)}\nContent: {block['content']}\n---"
+        tokens = count_tokens(part)
+        if used + tokens > max_tokens:
+            continue
+        parts.append(part)
+        used += tokens
+    return "\n".join(parts)
@@ -0,0 +1,90 @@
+"""
+Reading and splitting documents into chunks. This module only needs the
+loaders and the embedding model's tokenizer, so the ingestion parser pool can
+import it without loading sentence-transformers or torch in every worker.
+"""
+
+import os
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
+from langchain_core.documents import Document
+
+from .tokenizer import DEFAULT_MAX_SEQ_LENGTH, get_tokenizer
+
+# Chunks are sized in embedding-model tokens to fill its input window exactly, with this much overlap
+CHUNK_OVERLAP_TOKENS = 16
+# Recorded on every chunk; chunks of a file split any other way are replaced when it is ingested again
+CHUNKING = f"tokens:{DEFAULT_MAX_SEQ_LENGTH}:{CHUNK_OVERLAP_TOKENS}"
+# Prefer paragraph, line and sentence (including Devanagari danda) boundaries before splitting on words
+SEPARATORS = [r"\n\n", r"\n", r"(?<=[.!?।])\s+", r"\s", ""]
+# Plain text files have no pages; they are read in blocks of about this many characters instead
+TEXT_BLOCK_CHARS = 100_000
+
+@lru_cache(maxsize=None)
+def make_text_splitter() -> RecursiveCharacterTextSplitter:
+    """
+    The splitter used for ingestion, built once per process. Lengths are
+    counted with the embedding model's own tokenizer, so a chunk plus the
+    special tokens the model adds fits its max_seq_length and no text is
+    truncated away at encode time.
+    """
+    tokenizer = get_tokenizer()
+    return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+        tokenizer,
+        chunk_size=DEFAULT_MAX_SEQ_LENGTH - tokenizer.num_special_tokens_to_add(),
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        separators=SEPARATORS,
+        is_separator_regex=True,
+        # Character offset of each chunk in its page, so the context builder can merge neighbours
+        add_start_index=True,
+    )
+
+def iter_pages(file_path: str) -> Iterator[Document]:
+    """
+    Lazily yield a document page by page: PDF pages, blocks of lines for text
+    files, and the whole document for DOCX (docx2txt has no incremental API).
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == '.pdf':
+        yield from PyPDFLoader(file_path).lazy_load()
+    elif file_extension == '.docx':
+        yield from Docx2txtLoader(file_path).lazy_load()
+    elif file_extension == '.txt':
+        yield from _iter_text_blocks(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+def _iter_text_blocks(file_path: str, block_chars: int = TEXT_BLOCK_CHARS) -> Iterator[Document]:
+    lines = []
+    size = 0
+    page = 0
+    with open(file_path, encoding='utf-8') as f:
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            if size >= block_chars:
+                yield Document(page_content=''.join(lines), metadata={'source': file_path, 'page': page})
+                lines = []
+                size = 0
+                page += 1
+    if lines:
+        yield Document(page_content=''.join(lines), metadata={'source': file_path, 'page': page})
+
+def iter_page_chunks(file_path: str, text_splitter=None, start_page: int = 0) -> Iterator[Tuple[int, List]]:
+    """Yield (page number, chunks of that page), skipping pages before start_page."""
+    text_splitter = text_splitter or make_text_splitter()
+    for page_number, page in enumerate(iter_pages(file_path)):
+        if page_number < start_page:
+            continue
+        yield page_number, text_splitter.split_documents([page])
+
+def load_chunks(file_path: str, text_splitter=None) -> List:
+    """
+    Load a file with the loader matching its extension and split it into chunks.
+    Module-level so it can run in worker processes without a DocumentProcessor.
+    """
+    return [chunk for _, chunks in iter_page_chunks(file_path, text_splitter) for chunk in chunks]
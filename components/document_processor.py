@@ -1,59 +1,297 @@
+import hashlib
+import json
+import logging
 import os
-from typing import List, Dict
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from sentence_transformers import SentenceTransformer
-import chromadb
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+import numpy as np
+
+from .document_loader import CHUNKING, iter_page_chunks, load_chunks, make_text_splitter
+from .embedding_model import get_embedding_model
+from .keyword_index import BM25Index
+from .metrics import metrics, span
+from .vector_index import make_vector_index, namespace_directory
+
+logger = logging.getLogger(__name__)
+
+PERSIST_DIRECTORY = "chroma_db"
+
+def chunk_id(document_id: str, content: str) -> str:
+    """Content-addressed id of a chunk: unchanged text in the same document always maps to the same id."""
+    return hashlib.sha256(f"{document_id}\x00{content}".encode('utf-8')).hexdigest()
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-        self.embedding_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-mpnet-base-v2')
-        self.chroma_client = chromadb.Client()
-        self.collection = self.chroma_client.get_or_create_collection("multilingual_documents")
-
-    def process_document(self, file_path: str) -> List[Dict]:
-        """Load and process documents based on file type."""
-        file_extension = os.path.splitext(file_path)[1].lower()
-        
-        if file_extension == '.pdf':
-            loader = PyPDFLoader(file_path)
-        elif file_extension == '.docx':
-            loader = Docx2txtLoader(file_path)
-        elif file_extension == '.txt':
-            loader = TextLoader(file_path, encoding='utf-8')
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-        
-        docs = loader.load()
-        chunks = self.text_splitter.split_documents(docs)
+    def __init__(self, encode_batch_size: int = 32, store_batch_size: int = 256,
+                 persist_directory: str = PERSIST_DIRECTORY, vector_backend: Optional[str] = None,
+                 namespace: Optional[str] = None):
+        self.text_splitter = make_text_splitter()
+        self.embedding_model = get_embedding_model()
+        # Chroma, or a memory-mapped float16/int8 store (see vector_index.make_vector_index);
+        # a namespace's chunks are kept apart from every other namespace's
+        self.namespace = namespace
+        directory = namespace_directory(persist_directory, namespace)
+        os.makedirs(directory, exist_ok=True)
+        self.vector_index = make_vector_index(persist_directory, vector_backend, namespace)
+        self.keyword_index = BM25Index(os.path.join(directory, "bm25_index.pkl"))
+        # Chunks handed to the model per forward pass, and chunks embedded
+        # before they are flushed to the vector store.
+        self.encode_batch_size = encode_batch_size
+        self.store_batch_size = store_batch_size
+        # Bumped whenever stored content changes, so caches built on query results can tell they are stale
+        self.version = 0
+        # Next page to ingest for each document version (by id and content hash) whose ingestion did not finish
+        self._progress_path = os.path.join(directory, "ingest_progress.json")
+        self._backfill_keyword_index()
+
+    def process_document(self, file_path: str, source_name: Optional[str] = None,
+                         document_id: Optional[str] = None) -> List[Dict]:
+        """Load and process documents based on file type, returning only chunks not yet stored."""
         documents = []
+        for batch in self.iter_document_batches(file_path, source_name, document_id=document_id):
+            documents.extend(batch)
+        return documents
 
-        for i, chunk in enumerate(chunks):
-            # Ensure metadata is serializable
-            metadata = chunk.metadata
-            for key, value in metadata.items():
-                if not isinstance(value, (str, int, float, bool)):
-                    metadata[key] = str(value)
-
-            doc_data = {
-                'id': f"{os.path.basename(file_path)}_{i}",
-                'content': chunk.page_content,
-                'metadata': metadata,
-                'embedding': self.embedding_model.encode(chunk.page_content)
-            }
-            documents.append(doc_data)
+    def iter_document_batches(self, file_path: str, source_name: Optional[str] = None,
+                              file_hash: Optional[str] = None,
+                              document_id: Optional[str] = None) -> Iterator[List[Dict]]:
+        """Yield embedded chunks of a document in batches of at most store_batch_size."""
+        source_name = source_name or os.path.basename(file_path)
+        file_hash = file_hash or file_sha256(file_path)
+        return self.iter_chunk_batches(self._load_chunks(file_path), source_name, file_hash,
+                                       document_id or source_name)
+
+    def iter_chunk_batches(self, chunks: List, source_name: str, file_hash: str,
+                           document_id: Optional[str] = None) -> Iterator[List[Dict]]:
+        """
+        Embed already split chunks in batches of at most store_batch_size.
+        Chunks whose id is already in the vector index are not embedded again;
+        their metadata is just moved over to this version of the file.
+        document_id names the document the chunks belong to (source_name if not given).
+        """
+        document_id = document_id or source_name
+        seen_ids = set()
+        for start in range(0, len(chunks), self.store_batch_size):
+            batch = []
+            for chunk in chunks[start:start + self.store_batch_size]:
+                doc_id = chunk_id(document_id, chunk.page_content)
+                if doc_id not in seen_ids:
+                    seen_ids.add(doc_id)
+                    batch.append((doc_id, chunk, self._chunk_metadata(chunk, source_name, file_hash, document_id)))
+            if not batch:
+                continue
+
+            with span("ingest_dedupe"):
+                stored = self.vector_index.existing_ids([doc_id for doc_id, _, _ in batch])
+                if stored:
+                    self.vector_index.update_metadata(
+                        [doc_id for doc_id, _, _ in batch if doc_id in stored],
+                        [metadata for doc_id, _, metadata in batch if doc_id in stored]
+                    )
+            batch = [item for item in batch if item[0] not in stored]
+            if not batch:
+                continue
+
+            with span("ingest_embed"):
+                embeddings = self.embedding_model.encode(
+                    [chunk.page_content for _, chunk, _ in batch],
+                    batch_size=self.encode_batch_size,
+                    show_progress_bar=False
+                )
+
+            # Each 'embedding' is a row view of the batch's float32 array, not a copy
+            yield [
+                {
+                    'id': doc_id,
+                    'content': chunk.page_content,
+                    'metadata': metadata,
+                    'embedding': embedding
+                }
+                for (doc_id, chunk, metadata), embedding in zip(batch, embeddings)
+            ]
+
+    def ingest_document(self, file_path: str, source_name: Optional[str] = None, file_hash: Optional[str] = None,
+                        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                        document_id: Optional[str] = None) -> Dict:
+        """
+        Stream a document page -> chunks -> embeddings -> store, so peak memory
+        depends on the page and batch size rather than the document size. Only
+        new or changed chunks are embedded, and chunks of an earlier version of
+        the same document are removed at the end. document_id identifies that
+        document (source_name if not given); uploads that merely share a file
+        name should get different ids. If an earlier ingestion of the same file
+        was interrupted, it resumes after the last stored page.
+        progress_callback, if given, is called with (chunks processed, None).
+        Returns throughput stats.
+        """
+        source_name = source_name or os.path.basename(file_path)
+        file_hash = file_hash or file_sha256(file_path)
+        document_id = document_id or source_name
+        progress_key = self._progress_key(document_id, file_hash)
+        start_page = self._load_progress().get(progress_key, 0)
+        if start_page:
+            logger.info("Resuming ingestion of %s from page %d", source_name, start_page)
+
+        start_time = time.perf_counter()
+        total_chunks = 0
+        new_chunks = 0
+        pending = []
+        # Flush at page boundaries only, so a recorded page is always fully stored
+        parse_start = time.perf_counter()
+        for page_number, chunks in iter_page_chunks(file_path, self.text_splitter, start_page):
+            metrics.observe("ingest_parse", time.perf_counter() - parse_start)
+            pending.extend(chunks)
+            if len(pending) >= self.store_batch_size:
+                new_chunks += self._store_chunks(pending, source_name, file_hash, document_id)
+                total_chunks += len(pending)
+                pending = []
+                self._record_progress(progress_key, page_number + 1)
+                if progress_callback:
+                    progress_callback(total_chunks, None)
+            parse_start = time.perf_counter()
+        if pending:
+            new_chunks += self._store_chunks(pending, source_name, file_hash, document_id)
+            total_chunks += len(pending)
+            if progress_callback:
+                progress_callback(total_chunks, None)
+
+        return self._finish_ingest(source_name, file_hash, document_id, total_chunks, new_chunks, start_time)
+
+    def ingest_chunks(self, chunks: List, source_name: str, file_hash: str,
+                      progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                      document_id: Optional[str] = None) -> Dict:
+        """
+        Embed and store already split chunks of one document, as ingest_document does.
+        progress_callback, if given, is called with (chunks processed, total chunks).
+        """
+        document_id = document_id or source_name
+        start_time = time.perf_counter()
+        new_chunks = 0
+        for start in range(0, len(chunks), self.store_batch_size):
+            batch = chunks[start:start + self.store_batch_size]
+            new_chunks += self._store_chunks(batch, source_name, file_hash, document_id)
+            if progress_callback:
+                progress_callback(start + len(batch), len(chunks))
+
+        return self._finish_ingest(source_name, file_hash, document_id, len(chunks), new_chunks, start_time)
+
+    def _store_chunks(self, chunks: List, source_name: str, file_hash: str, document_id: str) -> int:
+        """Embed and store the chunks that are not stored yet; returns how many were embedded."""
+        new_chunks = 0
+        for batch in self.iter_chunk_batches(chunks, source_name, file_hash, document_id):
+            self.store_documents(batch)
+            new_chunks += len(batch)
+        return new_chunks
+
+    def _finish_ingest(self, source_name: str, file_hash: str, document_id: str, total_chunks: int,
+                       new_chunks: int, start_time: float) -> Dict:
+        with span("ingest_cleanup"):
+            removed_chunks = self._remove_stale_chunks(document_id, file_hash)
+            self.keyword_index.save()
+            self._record_progress(self._progress_key(document_id, file_hash), None)
+        metrics.inc("chunks_ingested", total_chunks)
+        metrics.inc("chunks_embedded", new_chunks)
+
+        elapsed = time.perf_counter() - start_time
+        chunks_per_sec = total_chunks / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            "Ingested %d chunks from %s (%d embedded, %d stale removed) in %.2fs (%.1f chunks/sec, "
+            "encode_batch_size=%d, store_batch_size=%d)", total_chunks, source_name, new_chunks,
+            removed_chunks, elapsed, chunks_per_sec, self.encode_batch_size, self.store_batch_size
+        )
+        return {
+            'chunks': total_chunks,
+            'new_chunks': new_chunks,
+            'removed_chunks': removed_chunks,
+            'seconds': elapsed,
+            'chunks_per_sec': chunks_per_sec
+        }
+
+    def _chunk_metadata(self, chunk, source_name: str, file_hash: str, document_id: str) -> Dict:
+        # Ensure metadata is serializable
+        metadata = chunk.metadata
+        for key, value in metadata.items():
+            if not isinstance(value, (str, int, float, bool)):
+                metadata[key] = str(value)
+        # The loader records the (temporary) path it read; keep the user-facing name instead
+        metadata['source'] = source_name
+        metadata['document_id'] = document_id
+        metadata['file_hash'] = file_hash
+        metadata['chunking'] = CHUNKING
+        return metadata
+
+    def _remove_stale_chunks(self, document_id: str, file_hash: str) -> int:
+        """
+        Delete stored chunks of document_id that do not belong to the version with
+        file_hash, or that were split differently from how it was just ingested.
+        """
+        stale_ids = [
+            doc_id for doc_id, metadata in self.vector_index.get_by_document(document_id)
+            if metadata.get('file_hash') != file_hash or metadata.get('chunking') != CHUNKING
+        ]
+        if stale_ids:
+            self.vector_index.delete(stale_ids)
+            self.keyword_index.remove(stale_ids)
+            self.version += 1
+        return len(stale_ids)
+
+    @staticmethod
+    def _progress_key(document_id: str, file_hash: str) -> str:
+        return f"{document_id}\x00{file_hash}"
+
+    def _load_progress(self) -> Dict[str, int]:
+        if not os.path.exists(self._progress_path):
+            return {}
+        with open(self._progress_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _record_progress(self, key: str, next_page: Optional[int]):
+        """Remember the next page to ingest for key (see _progress_key); None marks the file as finished."""
+        progress = self._load_progress()
+        if next_page is None:
+            if key not in progress:
+                return
+            del progress[key]
+        else:
+            progress[key] = next_page
+        temp_path = f"{self._progress_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        os.replace(temp_path, self._progress_path)
+
+    def _backfill_keyword_index(self, page_size: int = 5000):
+        """Index stored chunks missing from the keyword index, e.g. ones stored before it existed."""
+        if len(self.keyword_index) >= self.vector_index.count():
+            return
+        for ids, documents in self.vector_index.iter_documents(page_size):
+            self.keyword_index.add(ids, documents)
+        self.keyword_index.save()
+
+    def _load_chunks(self, file_path: str) -> List:
+        """Load a file with the loader matching its extension and split it into chunks."""
+        return load_chunks(file_path, self.text_splitter)
+
+    def close(self):
+        """Release the indexes; everything they hold is already on disk."""
+        self.vector_index.close()
 
-        return documents
-    
     def store_documents(self, documents: List[Dict]):
         """Store documents in vector database."""
         if not documents:
             return
-            
-        self.collection.add(
-            ids=[doc['id'] for doc in documents],
-            embeddings=[doc['embedding'].tolist() for doc in documents],
-            documents=[doc['content'] for doc in documents],
-            metadatas=[doc['metadata'] for doc in documents]
-        )
+
+        with span("ingest_store"):
+            self.vector_index.upsert(
+                [doc['id'] for doc in documents],
+                np.stack([doc['embedding'] for doc in documents]),
+                [doc['content'] for doc in documents],
+                [doc['metadata'] for doc in documents]
+            )
+            self.keyword_index.add([doc['id'] for doc in documents], [doc['content'] for doc in documents])
+        self.version += 1
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from .settings import get_setting
+from .tokenizer import DEFAULT_EMBEDDING_MODEL, DEFAULT_MAX_SEQ_LENGTH, get_tokenizer  # noqa: F401 (re-exported)
+# EMBEDDING_BACKEND values: fp32 PyTorch, PyTorch with dynamically int8-quantized linear layers, or ONNX Runtime
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+# Compared between a faster backend and fp32 at load time; one sentence per script the UI offers, plus a long one
+PARITY_PROBES = [
+    "What is the warranty period for the pump?",
+    "पंप की वारंटी अवधि क्या है?",
+    "পাম্পের ওয়ারেন্টি সময়কাল কত?",
+    "પંપની વોરંટી અવધિ શું છે?",
+    "ಪಂಪ್‌ನ ಖಾತರಿ ಅವಧಿ ಎಷ್ಟು?",
+    "പമ്പിന്റെ വാറന്റി കാലാവധി എത്രയാണ്?",
+    "पंपचा वॉरंटी कालावधी किती आहे?",
+    "ପମ୍ପର ୱାରେଣ୍ଟି ଅବଧି କେତେ?",
+    "ਪੰਪ ਦੀ ਵਾਰੰਟੀ ਮਿਆਦ ਕੀ ਹੈ?",
+    "பம்பின் உத்தரவாத காலம் என்ன?",
+    "The supplier shall replace any defective valve within thirty days of written notice, "
+    "provided the equipment was installed and maintained according to clause 4.2 of this agreement.",
+]
+
+logger = logging.getLogger(__name__)
+
+_registry: Dict[str, "LazyEmbeddingModel"] = {}
+_registry_lock = threading.Lock()
+
+
+class LazyEmbeddingModel:
+    """
+    SentenceTransformer wrapper that loads the model on first use.
+
+    The inference backend comes from EMBEDDING_BACKEND. A non-fp32 backend is
+    only used if, on the probe sentences, every embedding has cosine
+    similarity of at least EMBEDDING_PARITY_MIN with the fp32 one; otherwise
+    (or if it fails to load) the fp32 model is used. EMBEDDING_THREADS and
+    EMBEDDING_INTEROP_THREADS set the intra-/inter-op thread pools.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, backend: Optional[str] = None):
+        self.model_name = model_name
+        self.backend = backend or get_setting("EMBEDDING_BACKEND", "torch")
+        if self.backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND {self.backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
+        self.parity_threshold = float(get_setting("EMBEDDING_PARITY_MIN", "0.99"))
+        self.threads = int(get_setting("EMBEDDING_THREADS", "0")) or None
+        self.interop_threads = int(get_setting("EMBEDDING_INTEROP_THREADS", "0")) or None
+        # What is actually serving encode() once loaded, and its worst probe similarity to fp32
+        self.active_backend = None
+        self.parity = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start_time = time.perf_counter()
+                    model = self._load()
+                    self.load_seconds = time.perf_counter() - start_time
+                    logger.info("Loaded embedding model %s (%s) in %.2fs",
+                                self.model_name, self.active_backend, self.load_seconds)
+                    self._model = model
+        return self._model
+
+    def _load(self) -> SentenceTransformer:
+        self._configure_threads()
+        reference = SentenceTransformer(self.model_name)
+        self.active_backend = "torch"
+        if self.backend == "torch":
+            return reference
+
+        try:
+            candidate = self._load_backend(reference)
+        except Exception as e:
+            logger.warning("Embedding backend %s unavailable (%s); using fp32", self.backend, e)
+            return reference
+
+        expected = reference.encode(PARITY_PROBES, normalize_embeddings=True, show_progress_bar=False)
+        actual = candidate.encode(PARITY_PROBES, normalize_embeddings=True, show_progress_bar=False)
+        self.parity = float(np.min(np.sum(expected * actual, axis=1)))
+        if self.parity < self.parity_threshold:
+            logger.warning("Embedding backend %s failed the parity check (min cosine %.4f < %.4f); using fp32",
+                           self.backend, self.parity, self.parity_threshold)
+            return reference
+        self.active_backend = self.backend
+        return candidate
+
+    def _load_backend(self, reference: SentenceTransformer) -> SentenceTransformer:
+        if self.backend == "int8":
+            import torch
+            # Weights of the linear layers (most of the compute) become int8; activations are quantized per batch
+            return torch.quantization.quantize_dynamic(reference, {torch.nn.Linear}, dtype=torch.qint8)
+
+        # Needs sentence-transformers>=3.2 with its onnx extra (optimum + onnxruntime)
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        if self.interop_threads:
+            session_options.inter_op_num_threads = self.interop_threads
+        return SentenceTransformer(self.model_name, backend="onnx",
+                                   model_kwargs={"session_options": session_options})
+
+    def _configure_threads(self):
+        import torch
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        if self.interop_threads:
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError as e:
+                # Only allowed once per process, before any inter-op parallel work has started
+                logger.warning("Could not set inter-op threads: %s", e)
+
+    def encode(self, sentences, **kwargs):
+        return self.model.encode(sentences, **kwargs)
+
+    def warmup(self):
+        """Load the model and run a throwaway encode so the first real query is not slowed down."""
+        model = self.model
+        start_time = time.perf_counter()
+        model.encode(["warmup"], show_progress_bar=False)
+        self.warmup_seconds = time.perf_counter() - start_time
+
+
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> LazyEmbeddingModel:
+    """Return the process-wide shared embedding model for model_name."""
+    with _registry_lock:
+        if model_name not in _registry:
+            _registry[model_name] = LazyEmbeddingModel(model_name)
+        return _registry[model_name]
@@ -0,0 +1,238 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+# Statuses worth retrying: rate limiting, model loading and gateway hiccups
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+# The service is up but asking callers to slow down; these never count against the circuit breaker
+THROTTLE_STATUSES = {429}
+# The request never got an answer; worth retrying and a sign the service is down. Any other
+# exception without a status (a bug, a validation or decoding error) is raised at once.
+TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, httpx.TransportError)
+
+
+class CircuitOpenError(Exception):
+    """The endpoint failed repeatedly and calls are being short-circuited."""
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls until
+    reset_timeout has passed; then lets a single trial call through, closing
+    again on success and re-opening on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """The call neither proved the endpoint healthy nor broken (e.g. it was throttled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class ResilientHTTPClient:
+    """
+    Shared client for one upstream service: a keep-alive connection pool,
+    a cap on concurrent in-flight calls, retries with exponential backoff and
+    jitter (honouring Retry-After and the Hugging Face `estimated_time` hint on
+    503s), a circuit breaker, and per-endpoint latencies in the shared metrics.
+
+    post() covers plain HTTP calls; call() wraps any callable (e.g. an SDK
+    method) in the same concurrency, retry and breaker policy.
+
+    The breaker sees one outcome per logical call, after its retries, and
+    throttling (429, or a 503 saying the model is loading) is not a failure:
+    backing off from a cold start must not open the circuit for everyone.
+    A streamed response holds its concurrency slot until it is closed.
+    """
+
+    def __init__(self, name: str, pool_size: int = 10, max_concurrency: int = 8, timeout: float = 60.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 max_total_wait: float = 90.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_total_wait = max_total_wait
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def post(self, url: str, endpoint: Optional[str] = None, **kwargs) -> requests.Response:
+        """
+        POST with retries. Returns the last response (which may still be an
+        error status once retries are exhausted); raises CircuitOpenError or
+        the last requests exception.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self._with_retries(endpoint or url, lambda: self.session.post(url, **kwargs),
+                                  hold=bool(kwargs.get("stream")))
+
+    def call(self, endpoint: str, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) under the client's policy. Network errors and exceptions
+        carrying a retryable status_code are retried; other exceptions propagate at once
+        and do not count against the circuit breaker."""
+        return self._with_retries(endpoint, lambda: fn(*args, **kwargs))
+
+    def _with_retries(self, endpoint: str, send: Callable, hold: bool = False):
+        """
+        Send with retries and return the last response or raise the last error.
+        With hold, the returned response keeps its concurrency slot until it is
+        closed, so a streamed body counts as in flight while it is being read.
+        """
+        # Only the first attempt asks the breaker: retries of an admitted call run to the end
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        waited = 0.0
+        attempt = 0
+        while True:
+            start_time = time.perf_counter()
+            response, error = None, None
+            self._semaphore.acquire()
+            try:
+                response = send()
+            except TRANSPORT_ERRORS as e:
+                error = e
+            except Exception as e:
+                if not isinstance(getattr(e, "status_code", None), int):
+                    self._semaphore.release()
+                    self.breaker.record_neutral()
+                    raise
+                error = e
+            elapsed = time.perf_counter() - start_time
+
+            if error is None:
+                # call() results that are not HTTP responses (e.g. SDK objects) mean success
+                status = getattr(response, "status_code", 200)
+            else:
+                status = getattr(error, "status_code", None)
+            metrics.observe(f"http_{endpoint}", elapsed, ok=status is not None and status < 400)
+            # No status means the request never got an answer (connection error, timeout)
+            retryable = status is None or status in RETRYABLE_STATUSES
+            delay = None
+            if retryable and attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response if error is None else None)
+                if waited + delay > self.max_total_wait:
+                    delay = None
+
+            if delay is None:
+                self._record_outcome(status, response if error is None else None)
+                if error is not None:
+                    self._semaphore.release()
+                    raise error
+                if hold:
+                    self._release_on_close(response)
+                else:
+                    self._semaphore.release()
+                return response
+
+            if response is not None:
+                response.close()
+            self._semaphore.release()
+            time.sleep(delay)
+            waited += delay
+            attempt += 1
+
+    def _record_outcome(self, status: Optional[int], response: Optional[requests.Response]):
+        if status in THROTTLE_STATUSES or (status == 503 and self._estimated_time(response) is not None):
+            self.breaker.record_neutral()
+        elif status is None or status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _release_on_close(self, response: requests.Response):
+        close = response.close
+        released = []
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self._semaphore.release()
+
+        response.close = close_and_release
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            if response.status_code == 503:
+                # The model is loading: waiting about as long as it says beats hammering it
+                delay = max(delay, self._estimated_time(response) or 0.0)
+        return delay * random.uniform(0.9, 1.1)
+
+    @staticmethod
+    def _estimated_time(response: Optional[requests.Response]) -> Optional[float]:
+        """The `estimated_time` of a Hugging Face "model is loading" 503, if that is what this is."""
+        if response is None:
+            return None
+        try:
+            estimated = response.json().get("estimated_time")
+            return float(estimated) if estimated is not None else None
+        except (ValueError, AttributeError, TypeError):
+            return None
+
+
+_clients: Dict[str, ResilientHTTPClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name: str, **kwargs) -> ResilientHTTPClient:
+    """Return the process-wide client for a service, creating it with kwargs on first use."""
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = ResilientHTTPClient(name, **kwargs)
+        return _clients[name]
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .document_loader import load_chunks
+from .metrics import metrics
+from .namespaces import NamespaceManager
+
+
+class IngestionQueue:
+    """
+    Background ingestion of uploaded files.
+
+    Parsing and splitting run on a process pool, so several files are parsed in
+    parallel without holding the GIL. Embedding and storing run on a single
+    worker thread, which owns the embedding model and feeds the vector store in
+    batches. Files larger than stream_threshold_bytes skip the pool and are
+    streamed page by page on the worker thread instead, so their chunks are
+    never all in memory at once. Callers submit files and poll jobs() for
+    per-file status: parsing -> waiting -> embedding -> done | failed.
+    Each file is stored in the namespace it was submitted to. Finished jobs
+    are forgotten after finished_ttl seconds, or sooner beyond max_finished.
+    """
+
+    def __init__(self, namespaces: NamespaceManager, max_workers: Optional[int] = None,
+                 stream_threshold_bytes: int = 20 * 1024 * 1024, finished_ttl: float = 3600,
+                 max_finished: int = 1000):
+        self.namespaces = namespaces
+        self.stream_threshold_bytes = stream_threshold_bytes
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        # spawn rather than fork: the parent holds threads and a loaded torch model
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers or max(1, min(4, (os.cpu_count() or 2) - 1)),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._jobs: Dict[str, Dict] = {}
+        self._jobs_by_hash: Dict[Tuple[Optional[str], str, str], str] = {}
+        # Ids of done and failed jobs, oldest first
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._embed_queue: "queue.Queue" = queue.Queue()
+        self._embed_thread = threading.Thread(target=self._embed_loop, name="ingestion-embedder", daemon=True)
+        self._embed_thread.start()
+
+    def submit(self, file_path: str, source_name: str, file_hash: str, namespace: Optional[str] = None,
+               document_id: Optional[str] = None) -> str:
+        """
+        Queue a file for ingestion into namespace and return its job id. The
+        queue takes ownership of file_path and deletes it once it is read.
+        document_id identifies the document the file is a version of (see
+        DocumentProcessor.ingest_document); it defaults to source_name. The
+        same content of the same document, already queued or ingested in the
+        same namespace, returns the existing job.
+        """
+        document_id = document_id or source_name
+        with self._lock:
+            self._forget_finished()
+            existing = self._jobs_by_hash.get((namespace, document_id, file_hash))
+            if existing and self._jobs[existing]['status'] != 'failed':
+                os.unlink(file_path)
+                return existing
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'name': source_name,
+                'namespace': namespace,
+                'document_id': document_id,
+                'file_hash': file_hash,
+                'status': 'parsing',
+                'chunks_total': 0,
+                'chunks_done': 0,
+                'new_chunks': 0,
+                'chunks_per_sec': 0.0,
+                'error': None,
+                'submitted_at': time.time(),
+                'finished_at': None,
+            }
+            self._jobs_by_hash[(namespace, document_id, file_hash)] = job_id
+
+        if os.path.getsize(file_path) > self.stream_threshold_bytes:
+            self._update(job_id, status='waiting')
+            self._embed_queue.put((job_id, None, file_path))
+            return job_id
+
+        submitted_at = time.perf_counter()
+        future = self._pool.submit(load_chunks, file_path)
+        future.add_done_callback(lambda done: self._on_parsed(job_id, file_path, done, submitted_at))
+        return job_id
+
+    def jobs(self, job_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Snapshot of job status, for all jobs or the given ids."""
+        with self._lock:
+            self._forget_finished()
+            ids = job_ids if job_ids is not None else list(self._jobs)
+            return [dict(self._jobs[job_id]) for job_id in ids if job_id in self._jobs]
+
+    def namespace_jobs(self, namespace: Optional[str]) -> List[Dict]:
+        with self._lock:
+            self._forget_finished()
+            return [dict(job) for job in self._jobs.values() if job['namespace'] == namespace]
+
+    def is_busy(self, job_ids: Optional[List[str]] = None) -> bool:
+        return any(job['status'] not in ('done', 'failed') for job in self.jobs(job_ids))
+
+    def shutdown(self):
+        self._embed_queue.put(None)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _finish(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields, finished_at=time.time())
+            self._finished[job_id] = time.monotonic()
+
+    def _forget_finished(self):
+        cutoff = time.monotonic() - self.finished_ttl
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if finished >= cutoff and len(self._finished) <= self.max_finished:
+                return
+            del self._finished[job_id]
+            job = self._jobs.pop(job_id)
+            key = (job['namespace'], job['document_id'], job['file_hash'])
+            if self._jobs_by_hash.get(key) == job_id:
+                del self._jobs_by_hash[key]
+
+    def _on_parsed(self, job_id: str, file_path: str, future: Future, submitted_at: float):
+        self._remove_file(file_path)
+        try:
+            chunks = future.result()
+        except Exception as e:
+            metrics.observe("ingest_parse", time.perf_counter() - submitted_at, ok=False)
+            self._finish(job_id, status='failed', error=str(e))
+            return
+        # Includes time spent waiting for a free worker process
+        metrics.observe("ingest_parse", time.perf_counter() - submitted_at)
+        self._update(job_id, status='waiting', chunks_total=len(chunks))
+        self._embed_queue.put((job_id, chunks, None))
+
+    @staticmethod
+    def _remove_file(file_path: str):
+        try:
+            os.unlink(file_path)
+        except OSError:
+            pass
+
+    def _on_progress(self, job_id: str, done: int, total: Optional[int]):
+        if total is None:
+            self._update(job_id, chunks_done=done)
+        else:
+            self._update(job_id, chunks_done=done, chunks_total=total)
+
+    def _embed_loop(self):
+        while True:
+            item = self._embed_queue.get()
+            if item is None:
+                return
+            job_id, chunks, file_path = item
+            job = self.jobs([job_id])[0]
+            self._update(job_id, status='embedding')
+            progress_callback = lambda done, total: self._on_progress(job_id, done, total)
+            try:
+                # Pinned while it is written to, so the namespace is not closed under the worker
+                with self.namespaces.use(job['namespace']) as namespace:
+                    if chunks is None:
+                        try:
+                            stats = namespace.doc_processor.ingest_document(
+                                file_path, job['name'], job['file_hash'], progress_callback=progress_callback,
+                                document_id=job['document_id']
+                            )
+                        finally:
+                            self._remove_file(file_path)
+                    else:
+                        stats = namespace.doc_processor.ingest_chunks(
+                            chunks, job['name'], job['file_hash'], progress_callback=progress_callback,
+                            document_id=job['document_id']
+                        )
+                self._finish(
+                    job_id, status='done', chunks_total=stats['chunks'], new_chunks=stats['new_chunks'],
+                    chunks_per_sec=stats['chunks_per_sec']
+                )
+            except Exception as e:
+                self._finish(job_id, status='failed', error=str(e))
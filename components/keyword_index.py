@@ -0,0 +1,138 @@
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Word characters plus the Indic blocks, so vowel signs and viramas stay inside their word
+TOKEN_PATTERN = re.compile(r"[\w\u0900-\u0DFF]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over stored chunks.
+
+    Each term's postings are two parallel typed arrays (document numbers and
+    term frequencies), which are scored with numpy without copying. Removed
+    chunks are tombstoned rather than compacted.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_lengths = array('I')
+        self.alive = array('B')
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.total_length = 0
+        self.live_count = 0
+        self._id_to_number: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def __contains__(self, doc_id: str) -> bool:
+        number = self._id_to_number.get(doc_id)
+        return number is not None and bool(self.alive[number])
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Index chunks; ids that are already indexed are skipped."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self:
+                    continue
+                terms = Counter(tokenize(text))
+                number = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self._id_to_number[doc_id] = number
+                length = sum(terms.values())
+                self.doc_lengths.append(length)
+                self.alive.append(1)
+                self.total_length += length
+                self.live_count += 1
+                for term, frequency in terms.items():
+                    postings = self.postings.get(term)
+                    if postings is None:
+                        postings = self.postings[term] = (array('I'), array('H'))
+                    postings[0].append(number)
+                    postings[1].append(min(frequency, 0xFFFF))
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                number = self._id_to_number.pop(doc_id, None)
+                if number is None or not self.alive[number]:
+                    continue
+                self.alive[number] = 0
+                self.total_length -= self.doc_lengths[number]
+                self.live_count -= 1
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Return up to k (chunk id, BM25 score) pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self.live_count:
+                return []
+            doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+            average_length = self.total_length / self.live_count
+            scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                numbers = np.frombuffer(postings[0], dtype=np.uint32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                idf = math.log(1 + (self.live_count - len(numbers) + 0.5) / (len(numbers) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lengths[numbers] / average_length)
+                scores[numbers] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+            scores *= np.frombuffer(self.alive, dtype=np.uint8)
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            return [(self.doc_ids[number], float(scores[number])) for number in candidates]
+
+    def save(self):
+        """Atomically write the index next to the vector store."""
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                'doc_ids': self.doc_ids,
+                'doc_lengths': self.doc_lengths,
+                'alive': self.alive,
+                'postings': self.postings,
+                'total_length': self.total_length,
+                'live_count': self.live_count,
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            state = pickle.load(f)
+        self.doc_ids = state['doc_ids']
+        self.doc_lengths = state['doc_lengths']
+        self.alive = state['alive']
+        self.postings = state['postings']
+        self.total_length = state['total_length']
+        self.live_count = state['live_count']
+        self._id_to_number = {doc_id: number for number, doc_id in enumerate(self.doc_ids) if self.alive[number]}
@@ -0,0 +1,169 @@
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+# Upper bounds in seconds; wide enough for both a BM25 lookup and a cold LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "docchat"
+
+
+class Histogram:
+    """
+    Latency histogram: cumulative Prometheus-style buckets over all time, plus
+    a sliding window of raw samples for the percentiles shown in the UI.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._samples = deque(maxlen=window)
+
+    def observe(self, seconds: float, ok: bool = True):
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if not ok:
+            self.errors += 1
+        self._samples.append(seconds)
+
+    def percentiles(self) -> Dict[str, float]:
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        last = len(ordered) - 1
+        return {
+            'p50': ordered[int(last * 0.50)],
+            'p95': ordered[int(last * 0.95)],
+            'p99': ordered[int(last * 0.99)],
+            'max': ordered[-1],
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: per-stage latency histograms, counters, and collectors
+    that report gauges (e.g. cache stats) when metrics are read. Rendered as a
+    table for the sidebar or in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, ok: bool = True):
+        with self._lock:
+            if stage not in self._histograms:
+                self._histograms[stage] = Histogram()
+            self._histograms[stage].observe(seconds, ok)
+
+    def inc(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the block as one observation of stage; exceptions are counted as errors and re-raised."""
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.observe(stage, time.perf_counter() - start, ok)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict]):
+        """collector() returns a dict whose numeric values are exported as gauges named after it."""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def stage_summary(self) -> List[Dict]:
+        """One row per stage with call counts and latency percentiles in milliseconds."""
+        with self._lock:
+            rows = []
+            for stage, histogram in sorted(self._histograms.items()):
+                percentiles = histogram.percentiles()
+                rows.append({
+                    'stage': stage,
+                    'calls': histogram.count,
+                    'errors': histogram.errors,
+                    **{f"{key}_ms": round(value * 1000, 1) for key, value in percentiles.items()},
+                })
+            return rows
+
+    def gauges(self) -> Dict[str, float]:
+        with self._lock:
+            collectors = list(self._collectors.items())
+        gauges = {}
+        for name, collector in collectors:
+            try:
+                values = collector()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[_metric_name(f"{name}_{key}")] = value
+        return gauges
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            stage_metric = f"{METRIC_PREFIX}_stage_seconds"
+            if self._histograms:
+                lines.append(f"# HELP {stage_metric} Time spent per pipeline stage.")
+                lines.append(f"# TYPE {stage_metric} histogram")
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{stage_metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{stage_metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{stage_metric}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{stage_metric}_count{{stage="{stage}"}} {histogram.count}')
+            error_metric = f"{METRIC_PREFIX}_stage_errors_total"
+            if self._histograms:
+                lines.append(f"# TYPE {error_metric} counter")
+            for stage, histogram in sorted(self._histograms.items()):
+                lines.append(f'{error_metric}{{stage="{stage}"}} {histogram.errors}')
+            for name, value in sorted(self._counters.items()):
+                metric = f"{METRIC_PREFIX}_{_metric_name(name)}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+        for name, value in sorted(self.gauges().items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write the exposition text atomically, e.g. for node_exporter's textfile collector."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+# Process-wide registry shared by all components
+metrics = MetricsRegistry()
+
+
+def span(stage: str):
+    return metrics.span(stage)
+
+
+def observe(stage: str, seconds: float, ok: bool = True):
+    metrics.observe(stage, seconds, ok)
@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+from .metrics import metrics
+
+
+class Overloaded(Exception):
+    """Too much work is already queued; the caller should shed the request (e.g. HTTP 503) and retry later."""
+
+
+class MicroBatcher:
+    """
+    Merges concurrent single-item calls into batched calls.
+
+    Callers on any thread submit one item and get a Future. A worker thread
+    takes the first waiting item, gathers more for up to max_wait seconds or
+    until max_batch_size, and passes them to batch_fn(items), which must return
+    one result per item. While a batch runs, new items queue up for the next
+    one, so batches grow with load. More than max_pending waiting items raise
+    Overloaded instead of queueing without bound. Items submitted before
+    close() are still processed; submitting after it raises RuntimeError.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], name: str,
+                 max_batch_size: int = 32, max_wait: float = 0.005, max_pending: int = 256):
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"micro-batcher-{name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} batcher is closed")
+            if self._pending >= self.max_pending:
+                metrics.inc(f"{self.name}_rejected")
+                raise Overloaded(f"{self.name} has {self._pending} requests waiting")
+            self._pending += 1
+            # Queued under the lock, so nothing can land behind close()'s sentinel
+            self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item: Any, timeout: float = None) -> Any:
+        """Submit item and wait for its result."""
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.put(None)
+                    break
+                batch.append(entry)
+
+            with self._lock:
+                self._pending -= len(batch)
+            started = time.perf_counter()
+            for _, _, submitted_at in batch:
+                metrics.observe(f"{self.name}_batch_wait", started - submitted_at)
+            metrics.inc(f"{self.name}_batches")
+            metrics.inc(f"{self.name}_batched_items", len(batch))
+            try:
+                results = list(self.batch_fn([item for item, _, _ in batch]))
+                if len(results) != len(batch):
+                    raise ValueError(f"{self.name} batch function returned {len(results)} results "
+                                     f"for {len(batch)} items")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,199 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .answer_cache import SemanticAnswerCache
+from .document_processor import PERSIST_DIRECTORY, DocumentProcessor
+from .metrics import metrics
+from .micro_batcher import MicroBatcher
+from .retrieval_system import DocumentRetriever, embed_queries
+from .vector_index import drop_namespace_index, namespace_directory
+
+logger = logging.getLogger(__name__)
+
+# Touched whenever a namespace is used; namespaces untouched for longer than max_idle_seconds are deleted
+LAST_USED_FILE = "last_used"
+
+# Lowercase letters, digits, '-' and '_', starting and ending alphanumeric: safe as a
+# directory name and, prefixed with the collection name, as a Chroma collection name
+NAMESPACE_PATTERN = re.compile(r"[a-z0-9](?:[a-z0-9_-]{0,30}[a-z0-9])?")
+
+
+def is_valid_namespace(name: str) -> bool:
+    return bool(NAMESPACE_PATTERN.fullmatch(name or ""))
+
+
+class Namespace:
+    """One tenant's or session's documents: its own vector and keyword index, retriever and answer cache."""
+
+    def __init__(self, name: Optional[str], persist_directory: str, vector_backend: Optional[str]):
+        self.name = name
+        self.doc_processor = DocumentProcessor(persist_directory=persist_directory,
+                                               vector_backend=vector_backend, namespace=name)
+        self.retriever = DocumentRetriever(self.doc_processor.vector_index, self.doc_processor.keyword_index)
+        # Answers are only ever reused within the namespace they were retrieved from
+        self.answer_cache = SemanticAnswerCache(version_getter=lambda: self.doc_processor.version)
+        self.users = 0
+
+    @property
+    def chunks(self) -> int:
+        # The keyword index counts live chunks without a round trip to the vector store
+        return len(self.doc_processor.keyword_index)
+
+    def close(self):
+        self.retriever.close()
+        self.doc_processor.close()
+
+
+class NamespaceManager:
+    """
+    Opens namespaces on demand and keeps the recently used ones in memory.
+
+    Each namespace has its own index under persist_directory, so a search only
+    scans the chunks of the tenant or session asking. The unnamed namespace
+    (None) is the shared index the app used before namespaces existed. Beyond
+    max_open namespaces or max_resident_chunks chunks across them, the least
+    recently used ones that nothing is using are closed; their data stays on
+    disk and is reopened on the next request.
+
+    Named namespaces are only created by acquire(), which callers should
+    reserve for writes (see exists()). Those unused for max_idle_seconds are
+    deleted from disk, checked at most every prune_interval seconds.
+    """
+
+    def __init__(self, persist_directory: str = PERSIST_DIRECTORY, vector_backend: Optional[str] = None,
+                 max_open: int = 32, max_resident_chunks: int = 500_000, batching: bool = False,
+                 max_idle_seconds: Optional[float] = 30 * 86400, prune_interval: float = 3600):
+        self.persist_directory = persist_directory
+        self.vector_backend = vector_backend
+        self.max_open = max_open
+        self.max_resident_chunks = max_resident_chunks
+        self.max_idle_seconds = max_idle_seconds
+        self.prune_interval = prune_interval
+        self.evictions = 0
+        self.expired = 0
+        self._open: "OrderedDict[Optional[str], Namespace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_prune = None
+        # One embedding batcher for all namespaces, since they share the model
+        self._embed_batcher = MicroBatcher(embed_queries, "embed_query") if batching else None
+
+    def exists(self, name: Optional[str] = None) -> bool:
+        """Whether the namespace has been created; the shared one always exists."""
+        if name is None:
+            return True
+        return is_valid_namespace(name) and os.path.isdir(namespace_directory(self.persist_directory, name))
+
+    def acquire(self, name: Optional[str] = None) -> Namespace:
+        """Open (or reuse, or create) a namespace and pin it until release()."""
+        if name is not None and not is_valid_namespace(name):
+            raise ValueError(f"Invalid namespace {name!r}: use 1-32 lowercase letters, digits, '-' or '_'")
+        with self._lock:
+            namespace = self._open.get(name)
+            if namespace is None:
+                self._maybe_prune()
+                namespace = Namespace(name, self.persist_directory, self.vector_backend)
+                if self._embed_batcher is not None:
+                    namespace.retriever.enable_batching(embed_batcher=self._embed_batcher)
+                self._open[name] = namespace
+                metrics.inc("namespace_opens")
+            self._open.move_to_end(name)
+            namespace.users += 1
+            self._touch(name)
+            self._evict()
+            return namespace
+
+    def release(self, namespace: Namespace):
+        with self._lock:
+            namespace.users -= 1
+            self._evict()
+
+    @contextmanager
+    def use(self, name: Optional[str] = None) -> Iterator[Namespace]:
+        namespace = self.acquire(name)
+        try:
+            yield namespace
+        finally:
+            self.release(namespace)
+
+    def close(self):
+        with self._lock:
+            for namespace in self._open.values():
+                namespace.close()
+            self._open.clear()
+        if self._embed_batcher is not None:
+            self._embed_batcher.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'open': len(self._open),
+                'resident_chunks': sum(namespace.chunks for namespace in self._open.values()),
+                'evictions': self.evictions,
+                'expired': self.expired,
+            }
+
+    def prune(self) -> int:
+        """Delete namespaces that are not open and were last used more than max_idle_seconds ago."""
+        with self._lock:
+            return self._prune()
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if self._last_prune is None or now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self._prune()
+
+    def _prune(self) -> int:
+        root = os.path.join(self.persist_directory, "namespaces")
+        if self.max_idle_seconds is None or not os.path.isdir(root):
+            return 0
+        cutoff = time.time() - self.max_idle_seconds
+        removed = 0
+        for name in os.listdir(root):
+            directory = os.path.join(root, name)
+            if name in self._open or not is_valid_namespace(name) or not os.path.isdir(directory):
+                continue
+            marker = os.path.join(directory, LAST_USED_FILE)
+            last_used = os.path.getmtime(marker if os.path.exists(marker) else directory)
+            if last_used >= cutoff:
+                continue
+            drop_namespace_index(self.persist_directory, name, self.vector_backend)
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+        if removed:
+            self.expired += removed
+            metrics.inc("namespace_expired", removed)
+            logger.info("Deleted %d namespaces unused for %.0f days", removed, self.max_idle_seconds / 86400)
+        return removed
+
+    def _touch(self, name: Optional[str]):
+        if name is None:
+            return
+        marker = os.path.join(namespace_directory(self.persist_directory, name), LAST_USED_FILE)
+        with open(marker, "a"):
+            pass
+        os.utime(marker)
+
+    def _evict(self):
+        """Close idle namespaces, least recently used first, until both budgets are met."""
+        resident = sum(namespace.chunks for namespace in self._open.values())
+        for name in list(self._open):
+            if len(self._open) <= self.max_open and resident <= self.max_resident_chunks:
+                return
+            namespace = self._open[name]
+            if namespace.users:
+                continue
+            chunks = namespace.chunks
+            resident -= chunks
+            del self._open[name]
+            namespace.close()
+            self.evictions += 1
+            metrics.inc("namespace_evictions")
+            logger.info("Closed idle namespace %s (%d chunks)", name or "<shared>", chunks)
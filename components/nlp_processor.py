@@ -1,38 +1,210 @@
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import httpx
 import streamlit as st
-from sarvamai import SarvamAI
+from sarvamai import SarvamAI, SarvamAIEnvironment
+
+from .http_client import get_http_client
+from .settings import get_setting
+from .translation_cache import TranslationCache
+
+logger = logging.getLogger(__name__)
+
+# Unicode blocks of the Indic scripts offered in the UI, mapped to Sarvam codes.
+# Devanagari (Hindi and Marathi) and Latin (English and romanized Indic text)
+# are shared by several languages, so they are told apart by common words.
+SCRIPT_RANGES = [
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bn-IN"),
+    (0x0A00, 0x0A7F, "pa-IN"),
+    (0x0A80, 0x0AFF, "gu-IN"),
+    (0x0B00, 0x0B7F, "od-IN"),
+    (0x0B80, 0x0BFF, "ta-IN"),
+    (0x0C80, 0x0CFF, "kn-IN"),
+    (0x0D00, 0x0D7F, "ml-IN"),
+]
+
+# Function words that are frequent in one of Hindi or Marathi and rare in the other
+HINDI_WORDS = {"है", "हैं", "था", "थे", "का", "की", "के", "में", "और", "क्या", "नहीं", "मैं", "मुझे",
+               "यह", "वह", "को", "से", "पर", "कैसे", "कब", "कहाँ", "कितना", "कितनी"}
+MARATHI_WORDS = {"आहे", "आहेत", "होते", "होता", "नाही", "आणि", "किंवा", "मध्ये", "काय", "कसे", "कसा",
+                 "कुठे", "किती", "माझे", "माझा", "माझी", "तुम्ही", "आम्ही", "हे", "ते", "केले", "मला"}
+# English function words, and common words of romanized Hindi/Marathi that rule English out
+ENGLISH_WORDS = {"the", "a", "an", "is", "are", "was", "were", "be", "what", "which", "who", "when", "where",
+                 "why", "how", "of", "in", "on", "for", "to", "from", "with", "and", "or", "not", "do",
+                 "does", "did", "can", "could", "should", "will", "would", "this", "that", "these", "those",
+                 "it", "my", "your", "i", "me", "you", "we", "there", "about", "please", "tell", "explain"}
+ROMANIZED_INDIC_WORDS = {"hai", "hain", "ka", "ki", "ke", "kya", "kaise", "kab", "kahan", "kitna", "kitni",
+                         "mujhe", "mera", "meri", "mere", "nahi", "nahin", "aur", "mein", "ko", "se", "batao",
+                         "bataiye", "kripya", "aahe", "kay", "kasa", "kase", "mala", "majha", "ani"}
+WORD_PATTERN = re.compile(r"[\w\u0900-\u0DFF]+")
 
 class NLPProcessor:
-    def __init__(self):
+    def __init__(self, cache: Optional[TranslationCache] = None, max_parallel_requests: int = 4,
+                 timeout: float = 30.0):
         """Initializes the NLP Processor using the official SarvamAI SDK."""
+        # Retries, backoff and the circuit breaker come from the shared client layer;
+        # the SDK's own retries are switched off per request in _translate_uncached.
+        self.http = get_http_client("sarvam", max_concurrency=max_parallel_requests * 2, timeout=timeout)
         try:
-            self.client = SarvamAI(api_subscription_key=st.secrets["SARVAM_API_KEY"])
+            client_kwargs = {}
+            base_url = get_setting("SARVAM_BASE_URL")
+            if base_url:
+                # e.g. a local stand-in server for tests and benchmarks
+                client_kwargs['environment'] = SarvamAIEnvironment(
+                    base=base_url, creative=f"{base_url}/dubbing", production=base_url.replace("http", "ws", 1)
+                )
+            self.client = SarvamAI(
+                api_subscription_key=get_setting("SARVAM_API_KEY"),
+                httpx_client=httpx.Client(
+                    timeout=timeout,
+                    limits=httpx.Limits(max_connections=max_parallel_requests * 2,
+                                        max_keepalive_connections=max_parallel_requests * 2)
+                ),
+                **client_kwargs
+            )
         except Exception as e:
             self.client = None
             st.error(f"Failed to initialize Sarvam AI client: {e}")
+        self.cache = cache if cache is not None else TranslationCache()
+        self.max_parallel_requests = max_parallel_requests
+
+    def detect_language(self, text: str, min_ratio: float = 0.6) -> Optional[str]:
+        """
+        Offline script-based language detection. Returns a Sarvam language code
+        when at least min_ratio of the letters belong to a single script and,
+        for scripts shared by several languages, common words settle which one.
+        Returns None whenever that is not clear, so Sarvam auto-detects.
+        """
+        counts = {}
+        letters = 0
+        for char in text:
+            if not char.isalpha() and not (0x0900 <= ord(char) <= 0x0DFF):
+                continue
+            letters += 1
+            code = ord(char)
+            if code < 0x0250:
+                script = "en-IN"
+            else:
+                script = None
+                for start, end, name in SCRIPT_RANGES:
+                    if start <= code <= end:
+                        script = name
+                        break
+            if script:
+                counts[script] = counts.get(script, 0) + 1
+
+        if not letters or not counts:
+            return None
+        script, count = max(counts.items(), key=lambda item: item[1])
+        if count / letters < min_ratio:
+            return None
+        if script == "devanagari":
+            return self._devanagari_language(text)
+        if script == "en-IN":
+            return self._latin_language(text)
+        return script
+
+    @staticmethod
+    def _devanagari_language(text: str) -> Optional[str]:
+        words = set(WORD_PATTERN.findall(text))
+        hindi = bool(words & HINDI_WORDS)
+        # ळ (LLA) is common in Marathi and practically absent from Hindi
+        marathi = bool(words & MARATHI_WORDS) or "\u0933" in text
+        if marathi and not hindi:
+            return "mr-IN"
+        if hindi and not marathi:
+            return "hi-IN"
+        return None
+
+    @staticmethod
+    def _latin_language(text: str) -> Optional[str]:
+        """English only when English function words are present and romanized Indic ones are not."""
+        words = WORD_PATTERN.findall(text.lower())
+        if not words or not text.isascii() or any(word in ROMANIZED_INDIC_WORDS for word in words):
+            return None
+        english = sum(word in ENGLISH_WORDS for word in words)
+        return "en-IN" if english >= max(1, len(words) // 5) else None
 
     def translate_text(self, text: str, target_lang: str, source_lang: str = "auto") -> str:
         """
-        Translate text using the official Sarvam AI SDK.
+        Translate text using the official Sarvam AI SDK, consulting the translation cache first.
+        An "auto" source is resolved locally when the script is unambiguous, and no
+        request is made at all when the text is already in the target language.
         """
         if not self.client or not text or not text.strip():
             return text
+        if source_lang == "auto":
+            source_lang = self.detect_language(text) or "auto"
         if source_lang == target_lang and source_lang != "auto":
             return text
 
-        try:
-            print(f"--- Calling Sarvam Translate SDK ---")
-            print(f"Input: '{text[:50]}...', Source: {source_lang}, Target: {target_lang}")
+        cached = self.cache.get(text, source_lang, target_lang)
+        if cached is not None:
+            return cached
+
+        translated = self._translate_uncached(text, target_lang, source_lang)
+        if translated is None:
+            return text
+        self.cache.put(text, source_lang, target_lang, translated)
+        return translated
 
-            response = self.client.text.translate(
+    def translate_batch(self, texts: List[str], target_lang: str, source_lang: str = "auto") -> List[str]:
+        """
+        Translate many strings at once. Duplicates and cached strings cost no
+        request; the Sarvam translate endpoint takes a single input per call, so
+        the remaining misses are sent concurrently rather than one after another.
+        """
+        results = list(texts)
+        if not self.client:
+            return results
+
+        pending = {}
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            text_source = source_lang
+            if text_source == "auto":
+                text_source = self.detect_language(text) or "auto"
+            if text_source == target_lang and text_source != "auto":
+                continue
+            cached = self.cache.get(text, text_source, target_lang)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault((text, text_source), []).append(i)
+
+        if pending:
+            requests = list(pending)
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel_requests, len(requests))) as executor:
+                translations = executor.map(
+                    lambda request: self._translate_uncached(request[0], target_lang, request[1]), requests
+                )
+                for (text, text_source), translated in zip(requests, translations):
+                    if translated is None:
+                        continue
+                    self.cache.put(text, text_source, target_lang, translated)
+                    for i in pending[(text, text_source)]:
+                        results[i] = translated
+        return results
+
+    def _translate_uncached(self, text: str, target_lang: str, source_lang: str) -> Optional[str]:
+        """Call the Sarvam translate endpoint. Returns None if the call failed."""
+        try:
+            response = self.http.call(
+                "sarvam.translate",
+                self.client.text.translate,
                 input=text,
                 source_language_code=source_lang,
                 target_language_code=target_lang,
+                request_options={"max_retries": 0},
             )
-            
-            print(f"Sarvam Translate SDK Response: {response}")
-            
+            logger.debug("Translated %d chars %s -> %s", len(text), source_lang, target_lang)
             return response.translated_text
 
         except Exception as e:
-            print(f"ERROR in Sarvam SDK for translation: {e}")
-            return text
+            logger.warning("Sarvam translation %s -> %s failed: %s", source_lang, target_lang, e)
+            return None
@@ -1,51 +1,99 @@
 # components/response_generator.py
 
+import json
+import logging
 import requests
-import os
+import time
+from typing import Iterator
 import streamlit as st
-from .nlp_processor import NLPProcessor
+from .context_builder import make_token_counter, pack_context
+from .http_client import CircuitOpenError, get_http_client
+from .metrics import metrics, span
+from .settings import get_setting
 
 # Using the Mixtral model as it's a great, non-gated alternative for testing
 API_URL = "https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1"
+# Tokenizer of the model behind API_URL, for sizing the context; set HF_TOKENIZER to "" to estimate instead.
+# The mistralai repo is gated, so this is an ungated copy of the same tokenizer files.
+TOKENIZER_NAME = "TheBloke/Mixtral-8x7B-Instruct-v0.1-GPTQ"
+
+logger = logging.getLogger(__name__)
+
+class GenerationError(Exception):
+    """The LLM call failed; the message is meant to be shown to the user."""
 
 class ResponseGenerator:
-    def __init__(self):
-        try:
-            hf_token = st.secrets["HF_TOKEN"]
+    def __init__(self, context_tokens: int = 1024):
+        # HF_API_URL can point at another deployment or a local stand-in server
+        self.api_url = get_setting("HF_API_URL", API_URL)
+        self.http = get_http_client("huggingface", timeout=60)
+        hf_token = get_setting("HF_TOKEN")
+        if hf_token:
             self.headers = {"Authorization": f"Bearer {hf_token}"}
-        except (FileNotFoundError, KeyError):
+        else:
             self.headers = {}
             st.error("Hugging Face token not found. Please add HF_TOKEN to your secrets.")
             st.stop()
+        # Token budget for retrieved text in the prompt
+        self.context_tokens = context_tokens
+        self.count_tokens = make_token_counter(get_setting("HF_TOKENIZER", TOKENIZER_NAME), hf_token)
     
-    def generate_response(self, query: str, retrieved_docs: list, nlp_processor: NLPProcessor, target_language: str = 'en-IN') -> str:
-        context = self._create_context(retrieved_docs)
-        
+    def _create_context(self, docs: list) -> str:
+        """Pack the retrieved chunks into the prompt's token budget, without repeating overlapping text."""
+        return pack_context(docs, self.context_tokens, self.count_tokens)
+
+    def stream_response(self, query: str, retrieved_docs: list) -> Iterator[str]:
+        """
+        Yield the English answer token by token as the inference endpoint produces it.
+        Failures before the first token raise GenerationError.
+        """
         if not self.headers.get("Authorization"):
-            return "Cannot generate response because Hugging Face API token is missing."
+            raise GenerationError("Cannot generate response because Hugging Face API token is missing.")
+        with span("context_build"):
+            context = self._create_context(retrieved_docs)
+        payload = self._build_payload(query, context)
+        payload["stream"] = True
+
+        # Time to first token and the whole generation are recorded separately;
+        # time spent by the consumer between tokens counts towards the latter.
+        start_time = time.perf_counter()
+        first_token = True
+        ok = False
+        try:
+            response = self.http.post(self.api_url, endpoint="huggingface.generate_stream",
+                                      headers=self.headers, json=payload, stream=True)
+            # Closing the response also frees its slot in the client's concurrency limit
+            with response:
+                self._raise_for_status(response)
 
-        english_response = self._generate_with_hf_api(query, context)
+                # Text Generation Inference streams server-sent events, one token per `data:` line
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    if event.get("error"):
+                        logger.error("Hugging Face API stream error: %s", event['error'])
+                        raise GenerationError("I encountered an error while trying to reach the AI model. Please check the terminal logs.")
+                    token = event.get("token") or {}
+                    if token.get("special"):
+                        continue
+                    if token.get("text"):
+                        if first_token:
+                            metrics.observe("llm_first_token", time.perf_counter() - start_time)
+                            first_token = False
+                        yield token["text"]
+            ok = True
 
-        if target_language != 'en-IN' and english_response:
-            return nlp_processor.translate_text(english_response, source_lang='en-IN', target_lang=target_language)
-        
-        return english_response or "I could not generate a response based on the provided documents."
-    
-    def _create_context(self, docs: list, max_length: int = 4000) -> str:
-        context_parts = []
-        current_length = 0
-        for doc in docs:
-            content = doc.get('content', '')
-            if current_length + len(content) > max_length:
-                break
-            source = doc.get('metadata', {}).get('source', 'Unknown')
-            context_parts.append(f"Source: {os.path.basename(source)}\nContent: {content}\n---")
-            current_length += len(content)
-        return "\n".join(context_parts)
+        except CircuitOpenError as e:
+            logger.warning("Skipping Hugging Face API call: %s", e)
+            raise GenerationError("The AI model is temporarily unavailable after repeated errors. Please try again in a minute.")
+        except requests.exceptions.RequestException as e:
+            logger.error("Error calling Hugging Face API: %s", e)
+            raise GenerationError("I could not connect to the Hugging Face Inference API. Please check your internet connection.")
+        finally:
+            metrics.observe("llm", time.perf_counter() - start_time, ok)
 
-    def _generate_with_hf_api(self, query: str, context: str) -> str:
-        """Generate response using the Hugging Face Inference API with the correct prompt format."""
-        
+    def _build_payload(self, query: str, context: str) -> dict:
         # === THIS IS THE CORRECT PROMPT FORMAT FOR MISTRAL INSTRUCT MODELS ===
         system_prompt = "You are a helpful AI assistant. Answer the user's question based *only* on the provided context. If the context does not contain the answer, state that you could not find the information in the documents. Be concise."
         user_prompt = f"""CONTEXT:
@@ -56,7 +104,7 @@ class ResponseGenerator:
         prompt = f"<s>[INST] {system_prompt} \n\n{user_prompt} [/INST]"
         # =====================================================================
 
-        payload = {
+        return {
             "inputs": prompt,
             "parameters": {
                 "max_new_tokens": 350,
@@ -64,21 +112,13 @@ class ResponseGenerator:
                 "return_full_text": False,
             }
         }
-        
-        try:
-            response = requests.post(API_URL, headers=self.headers, json=payload, timeout=60)
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result[0]['generated_text'].strip()
-            elif response.status_code == 503:
-                st.toast("Model is loading, please wait a moment and try again...", icon="⏳")
-                return "The AI model is currently loading. This can take up to a minute. Please ask your question again shortly."
-            else:
-                error_message = f"Hugging Face API Error: {response.status_code} - {response.text}"
-                print(error_message) # This will print the exact error to your terminal
-                return "I encountered an error while trying to reach the AI model. Please check the terminal logs."
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error calling Hugging Face API: {e}")
-            return "I could not connect to the Hugging Face Inference API. Please check your internet connection."
+    def _raise_for_status(self, response):
+        if response.status_code == 200:
+            return
+        if response.status_code == 503:
+            st.toast("Model is still loading, please wait a moment and try again...", icon="⏳")
+            raise GenerationError("The AI model is currently loading. This can take up to a minute. Please ask your question again shortly.")
+        error_message = f"Hugging Face API Error: {response.status_code} - {response.text}"
+        logger.error(error_message)
+        raise GenerationError("I encountered an error while trying to reach the AI model. Please check the terminal logs.")
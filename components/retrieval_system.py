@@ -1,45 +1,101 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from .embedding_model import get_embedding_model
+from .keyword_index import BM25Index
+from .metrics import span
+from .micro_batcher import MicroBatcher
+
+def embed_queries(queries: List[str]) -> List[np.ndarray]:
+    """Embed several queries in one forward pass; the batch function behind query embedding batching."""
+    return list(get_embedding_model().encode(queries, batch_size=len(queries), show_progress_bar=False))
 
 class DocumentRetriever:
-    def __init__(self, chroma_collection):
-        self.collection = chroma_collection
-        self.embedding_model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-mpnet-base-v2')
+    def __init__(self, vector_index, keyword_index: Optional[BM25Index] = None):
+        # Any index from vector_index.make_vector_index; query embeddings are passed to it as numpy arrays
+        self.vector_index = vector_index
+        self.keyword_index = keyword_index
+        self.embedding_model = get_embedding_model()
+        self._embed_batcher: Optional[MicroBatcher] = None
+        self._query_batcher: Optional[MicroBatcher] = None
+        self._owns_embed_batcher = False
+
+    def enable_batching(self, max_batch_size: int = 32, max_wait: float = 0.005, max_pending: int = 256,
+                        embed_batcher: Optional[MicroBatcher] = None):
+        """
+        Merge query embeddings and vector queries from concurrent callers into
+        batched calls (see MicroBatcher). Callers beyond max_pending waiting
+        requests get micro_batcher.Overloaded. Retrievers over different
+        indexes can share one embed_batcher, since they share the model.
+        """
+        self._owns_embed_batcher = embed_batcher is None
+        self._embed_batcher = embed_batcher or MicroBatcher(embed_queries, "embed_query", max_batch_size,
+                                                            max_wait, max_pending)
+        self._query_batcher = MicroBatcher(self._query_many, "vector_query", max_batch_size, max_wait, max_pending)
+
+    def close(self):
+        """Stop the batching threads this retriever started."""
+        if self._query_batcher is not None:
+            self._query_batcher.close()
+            self._query_batcher = None
+        if self._embed_batcher is not None and self._owns_embed_batcher:
+            self._embed_batcher.close()
+        self._embed_batcher = None
 
-    def similarity_search(self, query: str, k: int = 5) -> List[Dict]:
+    def _query_many(self, requests: List) -> List[List[Dict]]:
+        k = max(request_k for _, request_k in requests)
+        results = self.vector_index.query_many(np.stack([embedding for embedding, _ in requests]), k)
+        return [hits[:request_k] for hits, (_, request_k) in zip(results, requests)]
+
+    def embed_query(self, query: str) -> np.ndarray:
+        with span("embed_query"):
+            if self._embed_batcher is not None:
+                return self._embed_batcher(query)
+            return self.embedding_model.encode(query)
+
+    def similarity_search(self, query: str, k: int = 5, query_embedding: Optional[np.ndarray] = None) -> List[Dict]:
         """Perform similarity search on documents."""
-        query_embedding = self.embedding_model.encode(query)
-        results = self.collection.query(
-            query_embeddings=[query_embedding.tolist()],
-            n_results=k
-        )
-        return self._format_results(results)
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        with span("vector_query"):
+            if self._query_batcher is not None:
+                return self._query_batcher((query_embedding, k))
+            return self.vector_index.query(query_embedding, k)
     
-    def hybrid_search(self, query: str, k: int = 5) -> List[Dict]:
+    def hybrid_search(self, query: str, k: int = 5, fetch_k: int = 20, rrf_k: int = 60,
+                      query_embedding: Optional[np.ndarray] = None) -> List[Dict]:
         """
-        Performs a similarity search. A true hybrid would require a different backend
-        like Weaviate or a more complex Chroma setup. For now, semantic search is powerful enough
-        with good multilingual models.
+        Combine vector search with BM25 keyword search by reciprocal-rank fusion.
+        Each ranker contributes 1 / (rrf_k + rank) for its top fetch_k chunks, so exact
+        terms such as part numbers or clause IDs surface even when their embedding
+        is not among the nearest neighbours.
         """
-        # For simplicity and power, we rely on the strong multilingual semantic search
-        return self.similarity_search(query, k)
-
-    def _format_results(self, results: Dict) -> List[Dict]:
-        """Format ChromaDB results into a list of dictionaries."""
-        formatted = []
-        if not results['documents'] or not results['documents'][0]:
-            return []
-
-        docs = results['documents'][0]
-        metadatas = results['metadatas'][0]
-        distances = results['distances'][0]
-
-        for i in range(len(docs)):
-            formatted.append({
-                'content': docs[i],
-                # Score is 1 - distance (cosine distance)
-                'score': 1 - distances[i] if distances else 0, 
-                'metadata': metadatas[i] if metadatas else {}
-            })
-        return formatted
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        vector_results = self.similarity_search(query, max(k, fetch_k), query_embedding)
+        if self.keyword_index is None or not len(self.keyword_index):
+            return vector_results[:k]
+        with span("keyword_query"):
+            keyword_results = self.keyword_index.search(query, max(k, fetch_k))
+
+        fused = {}
+        for rank, doc in enumerate(vector_results):
+            fused[doc['id']] = fused.get(doc['id'], 0.0) + 1.0 / (rrf_k + rank + 1)
+        for rank, (doc_id, _) in enumerate(keyword_results):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:k]
+
+        by_id = {doc['id']: doc for doc in vector_results}
+        missing_ids = [doc_id for doc_id in top_ids if doc_id not in by_id]
+        if missing_ids:
+            # Keyword-only hits, scored by cosine similarity to the query like the vector hits
+            with span("fetch_by_ids"):
+                by_id.update(self.vector_index.get(missing_ids, query_embedding))
+
+        results = []
+        for doc_id in top_ids:
+            if doc_id in by_id:
+                doc = dict(by_id[doc_id])
+                doc['rrf_score'] = fused[doc_id]
+                results.append(doc)
+        return results
@@ -0,0 +1,62 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+from .http_client import get_http_client
+
+
+class ServiceError(Exception):
+    """The chat service answered with an error status."""
+
+
+class RemoteChatBackend:
+    """Client for service.py with the same interface as LocalChatBackend, for running the UI as a thin client."""
+
+    def __init__(self, base_url: str, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        # Retries honour the service's Retry-After when it sheds load with a 503
+        self.http = get_http_client("chat_service", timeout=timeout)
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            # Also frees the client's concurrency slot held by a streamed response
+            response.close()
+            raise ServiceError(f"Chat service error {response.status_code}: {response.text[:200]}")
+        return response
+
+    def submit(self, file_path: str, source_name: str, file_hash: str, namespace: Optional[str] = None,
+               document_id: Optional[str] = None) -> str:
+        """
+        Upload a file for ingestion; like the local queue, takes ownership of
+        file_path and deletes it. The service hashes the content itself.
+        """
+        try:
+            with open(file_path, "rb") as f:
+                content = f.read()
+        finally:
+            os.unlink(file_path)
+        data = {key: value for key, value in (("namespace", namespace), ("document_id", document_id)) if value}
+        response = self._check(self.http.post(
+            f"{self.base_url}/ingest", endpoint="chat_service.ingest",
+            files={"file": (source_name, content)}, data=data or None
+        ))
+        return response.json()["job_id"]
+
+    def jobs(self, job_ids: Optional[List[str]] = None, namespace: Optional[str] = None) -> List[Dict]:
+        params = {"ids": ",".join(job_ids) if job_ids is not None else None, "namespace": namespace}
+        response = self._check(self.http.session.get(f"{self.base_url}/jobs", params=params, timeout=self.http.timeout))
+        return response.json()["jobs"]
+
+    def stream(self, query: str, language: str, namespace: Optional[str] = None) -> Iterator[Dict]:
+        response = self._check(self.http.post(
+            f"{self.base_url}/query", endpoint="chat_service.query",
+            json={"query": query, "language": language, "stream": True, "namespace": namespace}, stream=True
+        ))
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+    def stats(self, namespace: Optional[str] = None) -> Dict:
+        return self._check(self.http.session.get(f"{self.base_url}/stats", params={"namespace": namespace},
+                                                 timeout=self.http.timeout)).json()
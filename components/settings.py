@@ -0,0 +1,16 @@
+import os
+from typing import Optional
+
+import streamlit as st
+
+
+def get_setting(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Read a setting from Streamlit secrets, falling back to the environment.
+    The fallback lets the components run outside `streamlit run`, e.g. in the
+    benchmarks or against local stand-in servers.
+    """
+    try:
+        return st.secrets[name]
+    except Exception:
+        return os.environ.get(name, default)
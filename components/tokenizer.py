@@ -0,0 +1,20 @@
+"""
+The embedding model's tokenizer, without the model. Kept apart from
+embedding_model so processes that only split text (the ingestion parser
+pool) never import sentence-transformers or torch.
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+from transformers import AutoTokenizer
+
+DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
+# Input window of DEFAULT_EMBEDDING_MODEL in tokens (its max_seq_length); anything longer is truncated
+DEFAULT_MAX_SEQ_LENGTH = 128
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_name: str = DEFAULT_EMBEDDING_MODEL, token: Optional[str] = None):
+    """A model's tokenizer on its own, without the weights; cheap enough to load in worker processes."""
+    return AutoTokenizer.from_pretrained(model_name, token=token)
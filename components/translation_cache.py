@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+CACHE_PATH = os.path.join("cache", "translations.sqlite3")
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache: an in-memory LRU in front of an on-disk SQLite
+    table. Entries are keyed by (sha256 of the text, source, target) and both
+    tiers evict least recently used entries once their byte budget is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_PATH,
+                 max_memory_bytes: int = 8 * 1024 * 1024,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " text_hash TEXT, source TEXT, target TEXT, translation TEXT,"
+                " size INTEGER, last_used REAL,"
+                " PRIMARY KEY (text_hash, source, target))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str, source_lang: str, target_lang: str) -> Tuple[str, str, str]:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest(), source_lang, target_lang
+
+    def get(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
+        key = self.make_key(text, source_lang, target_lang)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT translation FROM translations WHERE text_hash = ? AND source = ? AND target = ?", key
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE translations SET last_used = ? WHERE text_hash = ? AND source = ? AND target = ?",
+                        (time.time(), *key)
+                    )
+                    self._db.commit()
+                    self._put_memory(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, source_lang: str, target_lang: str, translation: str):
+        key = self.make_key(text, source_lang, target_lang)
+        with self._lock:
+            self._put_memory(key, translation)
+            if self._db is not None:
+                self._put_disk(key, translation)
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes,
+            'disk_bytes': self._disk_bytes,
+        }
+
+    def _put_memory(self, key: Tuple[str, str, str], translation: str):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key).encode('utf-8'))
+        self._memory[key] = translation
+        self._memory_bytes += len(translation.encode('utf-8'))
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.encode('utf-8'))
+
+    def _put_disk(self, key: Tuple[str, str, str], translation: str):
+        size = len(translation.encode('utf-8'))
+        previous = self._db.execute(
+            "SELECT size FROM translations WHERE text_hash = ? AND source = ? AND target = ?", key
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, translation, size, time.time())
+        )
+        self._disk_bytes += size - (previous[0] if previous else 0)
+
+        if self._disk_bytes > self.max_disk_bytes:
+            # Drop the least recently used tenth of the budget in one pass rather than row by row
+            target_bytes = int(self.max_disk_bytes * 0.9)
+            freed = 0
+            victims = []
+            for text_hash, source, target, row_size in self._db.execute(
+                "SELECT text_hash, source, target, size FROM translations ORDER BY last_used"
+            ):
+                if self._disk_bytes - freed <= target_bytes:
+                    break
+                victims.append((text_hash, source, target))
+                freed += row_size
+            self._db.executemany(
+                "DELETE FROM translations WHERE text_hash = ? AND source = ? AND target = ?", victims
+            )
+            self._disk_bytes -= freed
+        self._db.commit()
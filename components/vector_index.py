@@ -0,0 +1,503 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "multilingual_documents"
+# VECTOR_BACKEND values: Chroma's HNSW index, or the memory-mapped exact-search store at either precision
+BACKENDS = ("chroma", "float16", "int8")
+# SQLite caps the number of bound parameters per statement
+SQLITE_BATCH = 900
+
+
+@lru_cache(maxsize=None)
+def chroma_client(persist_directory: str):
+    """
+    The Chroma client for persist_directory, shared by all its collections.
+    Loaded HNSW segments are kept in an LRU cache bounded by
+    CHROMA_MEMORY_LIMIT_MB, so collections of idle namespaces are unloaded
+    once newer ones need the memory (Chroma's default cache never evicts).
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    memory_limit_mb = int(get_setting("CHROMA_MEMORY_LIMIT_MB", "1024"))
+    settings = Settings(anonymized_telemetry=False)
+    if memory_limit_mb > 0:
+        settings = Settings(anonymized_telemetry=False, chroma_segment_cache_policy="LRU",
+                            chroma_memory_limit_bytes=memory_limit_mb * 1024 * 1024)
+    return chromadb.PersistentClient(path=persist_directory, settings=settings)
+
+
+class ChromaVectorIndex:
+    """Vector index backed by a persistent Chroma collection (HNSW, cosine space)."""
+
+    def __init__(self, persist_directory: str, name: str = COLLECTION_NAME):
+        self.client = chroma_client(persist_directory)
+        self.collection = self.client.get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        # Chroma validates embeddings as lists of floats, so this backend still has to convert
+        self.collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        return set(self.collection.get(ids=ids, include=[])['ids'])
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+
+    def get_by_document(self, document_id: str) -> List[Tuple[str, Dict]]:
+        stored = self.collection.get(where={"$or": [{"document_id": document_id}, {"source": document_id}]},
+                                     include=['metadatas'])
+        return [(doc_id, metadata or {}) for doc_id, metadata in zip(stored['ids'], stored['metadatas'])
+                if document_of(metadata or {}) == document_id]
+
+    def delete(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def iter_documents(self, page_size: int = 5000) -> Iterator[Tuple[List[str], List[str]]]:
+        offset = 0
+        while True:
+            page = self.collection.get(include=['documents'], limit=page_size, offset=offset)
+            if not page['ids']:
+                return
+            yield page['ids'], page['documents']
+            offset += len(page['ids'])
+
+    def query(self, query_embedding: np.ndarray, k: int) -> List[Dict]:
+        return self.query_many(np.asarray(query_embedding)[None, :], k)[0]
+
+    def query_many(self, query_embeddings: np.ndarray, k: int) -> List[List[Dict]]:
+        """Top k chunks for each row of query_embeddings, in one Chroma query."""
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(), n_results=k
+        )
+        formatted = []
+        for i in range(len(query_embeddings)):
+            docs = results['documents'][i] if results['documents'] else []
+            metadatas = results['metadatas'][i] if results['metadatas'] else None
+            distances = results['distances'][i] if results['distances'] else None
+            formatted.append([
+                {
+                    'id': results['ids'][i][j],
+                    'content': docs[j],
+                    # Score is 1 - distance (cosine distance)
+                    'score': 1 - distances[j] if distances else 0,
+                    'metadata': metadatas[j] if metadatas else {}
+                }
+                for j in range(len(docs))
+            ])
+        return formatted
+
+    def close(self):
+        # The client is shared by every collection under the directory; its LRU
+        # segment cache (see chroma_client) unloads this collection when memory is needed
+        self.collection = None
+
+    def get(self, ids: List[str], query_embedding: np.ndarray) -> Dict[str, Dict]:
+        """Load the given chunks, scored by cosine similarity to query_embedding."""
+        records = self.collection.get(ids=ids, include=['documents', 'metadatas', 'embeddings'])
+        if not records['ids']:
+            return {}
+        embeddings = np.asarray(records['embeddings'], dtype=np.float32)
+        similarities = embeddings @ query_embedding / (
+            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-12
+        )
+        return {
+            doc_id: {
+                'id': doc_id,
+                'content': records['documents'][i],
+                'score': float(similarities[i]),
+                'metadata': records['metadatas'][i] if records['metadatas'] else {}
+            }
+            for i, doc_id in enumerate(records['ids'])
+        }
+
+
+class MemmapVectorIndex:
+    """
+    Vector index that keeps normalized embeddings in a memory-mapped file as
+    float16, or as int8 with one float32 scale per row, and answers queries
+    with a vectorized exact scan in blocks. Texts and metadata live in a SQLite
+    docstore whose row numbers are the vector rows.
+
+    With rescore, full-precision copies are kept in a second file that is only
+    read for the top k * oversample candidates of the compact scan, which are
+    then re-ranked in float32. Several processes can open the same directory
+    and share the vectors through the page cache; only one should write.
+    Deleted rows are masked rather than compacted.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float16", rescore: bool = True,
+                 oversample: int = 4, block_rows: int = 8192):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.rescore = rescore
+        self.oversample = oversample
+        self.block_rows = block_rows
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(directory, "docstore.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, source TEXT, document TEXT, metadata TEXT,"
+            " document_id TEXT)"
+        )
+        if "document_id" not in {column[1] for column in self._db.execute("PRAGMA table_info(chunks)")}:
+            # Docstores written before chunks recorded the document they belong to
+            self._db.execute("ALTER TABLE chunks ADD COLUMN document_id TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_document_id ON chunks (document_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+        info = dict(self._db.execute("SELECT key, value FROM info").fetchall())
+        if info.get('dtype', dtype) != dtype:
+            raise ValueError(f"{directory} holds {info['dtype']} vectors, not {dtype}")
+        if rescore and info.get('rescore') == '0':
+            # Some rows were stored without full-precision copies, so none can be re-scored
+            logger.warning("%s was built without rescoring; searching the %s vectors only", directory, dtype)
+            self.rescore = False
+        self.dim: Optional[int] = int(info['dim']) if 'dim' in info else None
+        self._next_row = int(info.get('next_row', 0))
+        self._capacity = 0
+        self._vectors = self._scales = self._full = None
+        self._alive = np.zeros(0, dtype=bool)
+        if self.dim is not None:
+            self._open(self._file_capacity())
+            live_rows = np.fromiter((row for (row,) in self._db.execute("SELECT row FROM chunks")), dtype=np.int64)
+            self._alive[live_rows] = True
+
+    # Storage files
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _files(self) -> List[Tuple[str, np.dtype]]:
+        files = [(f"vectors.{self.dtype.name}", self.dtype)]
+        if self.dtype == np.int8:
+            files.append(("scales.float32", np.dtype(np.float32)))
+        if self.rescore:
+            files.append(("vectors.float32", np.dtype(np.float32)))
+        return files
+
+    def _row_bytes(self, name: str, dtype: np.dtype) -> int:
+        return (1 if name.startswith("scales") else self.dim) * dtype.itemsize
+
+    def _file_capacity(self) -> int:
+        name, dtype = self._files()[0]
+        path = self._path(name)
+        return os.path.getsize(path) // self._row_bytes(name, dtype) if os.path.exists(path) else 0
+
+    def _open(self, capacity: int):
+        """(Re)map the storage files at capacity rows, growing them on disk as needed."""
+        maps = []
+        for name, dtype in self._files():
+            path = self._path(name)
+            size = capacity * self._row_bytes(name, dtype)
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            shape = (capacity,) if name.startswith("scales") else (capacity, self.dim)
+            maps.append(np.memmap(path, dtype=dtype, mode="r+", shape=shape) if capacity else None)
+        self._vectors = maps[0]
+        self._scales = maps[1] if self.dtype == np.int8 else None
+        self._full = maps[-1] if self.rescore else None
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive[:capacity]
+        self._alive = alive
+        self._capacity = capacity
+
+    def _ensure_capacity(self, rows: int):
+        if rows > self._capacity:
+            # Readers holding the old maps keep working: the files only ever grow
+            self._open(max(rows, self._capacity * 2, 1024))
+
+    def _write_vectors(self, rows: np.ndarray, embeddings: np.ndarray):
+        if self.dtype == np.int8:
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._vectors[rows] = np.rint(embeddings / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        else:
+            self._vectors[rows] = embeddings.astype(np.float16)
+        if self.rescore:
+            self._full[rows] = embeddings
+
+    def _flush(self):
+        for array in (self._vectors, self._scales, self._full):
+            if array is not None:
+                array.flush()
+
+    # Docstore helpers
+
+    def _rows_for(self, ids: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(ids), SQLITE_BATCH):
+            batch = ids[start:start + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._db.execute(f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", batch).fetchall())
+        return rows
+
+    def _records_for_rows(self, rows: List[int]) -> Dict[int, Tuple[str, str, Dict]]:
+        records = {}
+        for start in range(0, len(rows), SQLITE_BATCH):
+            batch = rows[start:start + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for row, doc_id, document, metadata in self._db.execute(
+                f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({placeholders})", batch
+            ):
+                records[row] = (doc_id, document, json.loads(metadata) if metadata else {})
+        return records
+
+    # Index interface
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[None, :]
+        embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._db.executemany("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                                     [('dim', str(self.dim)), ('dtype', self.dtype.name),
+                                      ('rescore', '1' if self.rescore else '0')])
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {embeddings.shape[1]}")
+            elif not self.rescore:
+                # These rows get no full-precision copy, so the index can never be re-scored again
+                self._db.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('rescore', '0')")
+
+            assigned = self._rows_for(ids)
+            next_row = self._next_row
+            rows = []
+            for doc_id in ids:
+                if doc_id not in assigned:
+                    assigned[doc_id] = next_row
+                    next_row += 1
+                rows.append(assigned[doc_id])
+            rows = np.asarray(rows, dtype=np.int64)
+
+            self._ensure_capacity(next_row)
+            self._write_vectors(rows, embeddings)
+            self._flush()
+            self._db.executemany(
+                "INSERT INTO chunks (row, id, source, document, metadata, document_id) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET source = excluded.source, document = excluded.document, "
+                "metadata = excluded.metadata, document_id = excluded.document_id",
+                [(int(row), doc_id, (metadata or {}).get('source'), document, json.dumps(metadata or {}),
+                  (metadata or {}).get('document_id'))
+                 for row, doc_id, document, metadata in zip(rows, ids, documents, metadatas)]
+            )
+            self._db.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('next_row', ?)", (str(next_row),))
+            self._db.commit()
+            self._alive[rows] = True
+            self._next_row = next_row
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        with self._lock:
+            return set(self._rows_for(ids))
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE chunks SET source = ?, metadata = ?, document_id = ? WHERE id = ?",
+                [((metadata or {}).get('source'), json.dumps(metadata or {}), (metadata or {}).get('document_id'),
+                  doc_id) for doc_id, metadata in zip(ids, metadatas)]
+            )
+            self._db.commit()
+
+    def get_by_document(self, document_id: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return [(doc_id, json.loads(metadata) if metadata else {}) for doc_id, metadata in self._db.execute(
+                "SELECT id, metadata FROM chunks WHERE document_id = ? OR (document_id IS NULL AND source = ?)",
+                (document_id, document_id)
+            )]
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            rows = list(self._rows_for(ids).values())
+            for start in range(0, len(ids), SQLITE_BATCH):
+                batch = ids[start:start + SQLITE_BATCH]
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+            self._alive[rows] = False
+
+    def close(self):
+        """Flush and unmap the vector files and close the docstore; the index cannot be used afterwards."""
+        with self._lock:
+            self._flush()
+            self._vectors = self._scales = self._full = None
+            self._alive = np.zeros(0, dtype=bool)
+            self._capacity = 0
+            self._db.close()
+
+    def iter_documents(self, page_size: int = 5000) -> Iterator[Tuple[List[str], List[str]]]:
+        last_row = -1
+        while True:
+            with self._lock:
+                page = self._db.execute(
+                    "SELECT row, id, document FROM chunks WHERE row > ? ORDER BY row LIMIT ?", (last_row, page_size)
+                ).fetchall()
+            if not page:
+                return
+            yield [doc_id for _, doc_id, _ in page], [document for _, _, document in page]
+            last_row = page[-1][0]
+
+    def _scan(self, queries: np.ndarray, candidates: int, vectors, scales, alive,
+              rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top candidates (row numbers, scores) per query of a blockwise scan over
+        the compact vectors; each block is converted once for all queries.
+        Missing candidates (fewer live rows) score -inf.
+        """
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, rows, self.block_rows):
+            end = min(start + self.block_rows, rows)
+            scores = queries @ vectors[start:end].astype(np.float32).T
+            if scales is not None:
+                scores *= scales[start:end]
+            scores[:, ~alive[start:end]] = -np.inf
+            block_rows = np.broadcast_to(np.arange(start, end, dtype=np.int64), scores.shape)
+            best_rows = np.concatenate([best_rows, block_rows], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > candidates:
+                keep = np.argpartition(-best_scores, candidates - 1, axis=1)[:, :candidates]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        return best_rows, best_scores
+
+    def query(self, query_embedding: np.ndarray, k: int) -> List[Dict]:
+        return self.query_many(np.asarray(query_embedding)[None, :], k)[0]
+
+    def query_many(self, query_embeddings: np.ndarray, k: int) -> List[List[Dict]]:
+        """Top k chunks for each row of query_embeddings, sharing one scan of the index."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+        with self._lock:
+            # Snapshot the maps; a concurrent upsert may remap, but never shrinks what these cover
+            vectors, scales, full, alive, rows = self._vectors, self._scales, self._full, self._alive, self._next_row
+        if vectors is None or rows == 0 or k <= 0:
+            return [[] for _ in queries]
+
+        candidates = k * self.oversample if full is not None else k
+        scanned_rows, scanned_scores = self._scan(queries, candidates, vectors, scales, alive, rows)
+        ranked = []
+        for query, top_rows, top_scores in zip(queries, scanned_rows, scanned_scores):
+            valid = np.isfinite(top_scores)
+            top_rows, top_scores = top_rows[valid], top_scores[valid]
+            if full is not None and len(top_rows):
+                top_rows = np.sort(top_rows)
+                top_scores = full[top_rows] @ query
+            order = np.argsort(-top_scores)[:k]
+            ranked.append((top_rows[order], top_scores[order]))
+
+        with self._lock:
+            records = self._records_for_rows(sorted({int(row) for top_rows, _ in ranked for row in top_rows}))
+        results = []
+        for top_rows, top_scores in ranked:
+            hits = []
+            for row, score in zip(top_rows, top_scores):
+                record = records.get(int(row))
+                if record is not None:
+                    doc_id, document, metadata = record
+                    hits.append({'id': doc_id, 'content': document, 'score': float(score), 'metadata': metadata})
+            results.append(hits)
+        return results
+
+    def get(self, ids: List[str], query_embedding: np.ndarray) -> Dict[str, Dict]:
+        """Load the given chunks, scored by cosine similarity to query_embedding."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) + 1e-12)
+        with self._lock:
+            rows = sorted(self._rows_for(ids).values())
+            records = self._records_for_rows(rows)
+            if not rows:
+                return {}
+            row_array = np.asarray(rows, dtype=np.int64)
+            if self._full is not None:
+                scores = self._full[row_array] @ query
+            else:
+                scores = self._vectors[row_array].astype(np.float32) @ query
+                if self._scales is not None:
+                    scores *= self._scales[row_array]
+        fetched = {}
+        for row, score in zip(rows, scores):
+            doc_id, document, metadata = records[row]
+            fetched[doc_id] = {'id': doc_id, 'content': document, 'score': float(score), 'metadata': metadata}
+        return fetched
+
+
+def document_of(metadata: Dict) -> Optional[str]:
+    """
+    The document a chunk belongs to, i.e. what a new version of it replaces.
+    Chunks stored before document ids were recorded belong to their file name.
+    """
+    return metadata.get('document_id') or metadata.get('source')
+
+
+def namespace_directory(persist_directory: str, namespace: Optional[str] = None) -> str:
+    """Where a namespace keeps its files; the unnamed namespace uses persist_directory itself."""
+    return os.path.join(persist_directory, "namespaces", namespace) if namespace else persist_directory
+
+
+def drop_namespace_index(persist_directory: str, namespace: str, backend: Optional[str] = None):
+    """
+    Delete a namespace's Chroma collection, if it has one. The memory-mapped
+    backends keep everything in the namespace directory, which the caller removes.
+    """
+    if (backend or get_setting("VECTOR_BACKEND", "chroma")) != "chroma":
+        return
+    try:
+        chroma_client(persist_directory).delete_collection(f"{COLLECTION_NAME}_{namespace}")
+    except Exception as e:
+        # Never created (nothing was uploaded) or already gone
+        logger.debug("No collection to drop for namespace %s: %s", namespace, e)
+
+
+def make_vector_index(persist_directory: str, backend: Optional[str] = None, namespace: Optional[str] = None):
+    """
+    Open the vector index configured by VECTOR_BACKEND (chroma by default)
+    under persist_directory. The memory-mapped backends live in their own
+    subdirectory; switching backends does not migrate stored chunks.
+
+    A namespace gets an index of its own: a separate collection in the same
+    Chroma database, or separate memory-mapped files under its directory.
+    """
+    backend = backend or get_setting("VECTOR_BACKEND", "chroma")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if backend == "chroma":
+        return ChromaVectorIndex(persist_directory, f"{COLLECTION_NAME}_{namespace}" if namespace else COLLECTION_NAME)
+    rescore = str(get_setting("VECTOR_RESCORE", "1")).lower() not in ("0", "false", "no")
+    logger.info("Using memory-mapped %s vector index (rescore=%s)", backend, rescore)
+    return MemmapVectorIndex(os.path.join(namespace_directory(persist_directory, namespace), f"vectors_{backend}"),
+                             dtype=backend, rescore=rescore)
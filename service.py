@@ -0,0 +1,201 @@
+"""
+Headless ingest/query service.
+
+    uvicorn service:app --host 0.0.0.0 --port 8000
+
+Runs the same components as the Streamlit app, once per process, with query
+embeddings and vector searches of concurrent requests merged into batches.
+Point the UI at it with CHAT_SERVICE_URL=http://<host>:8000 to use Streamlit
+as a thin client. Requests beyond MAX_CONCURRENT_QUERIES, or beyond
+MAX_PENDING_INGEST_JOBS queued files, are turned away with 503 + Retry-After.
+
+Every call takes an optional namespace (a tenant or session id): documents
+ingested into a namespace are only searched by queries in it. Without one,
+the shared index is used.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from components.chat_backend import LocalChatBackend
+from components.chat_pipeline import set_stream_concurrency
+from components.document_processor import file_sha256
+from components.metrics import metrics
+from components.micro_batcher import Overloaded
+from components.namespaces import is_valid_namespace
+from components.settings import get_setting
+
+logging.basicConfig(level=get_setting("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("service")
+
+MAX_CONCURRENT_QUERIES = int(get_setting("MAX_CONCURRENT_QUERIES", "32"))
+MAX_PENDING_INGEST_JOBS = int(get_setting("MAX_PENDING_INGEST_JOBS", "16"))
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+backend: Optional[LocalChatBackend] = None
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    global backend
+    # Each admitted query can have its translation and embedding in flight at once, and
+    # both wait on the micro-batchers; the default pool (cpu + 4 threads) would cap
+    # batches at a handful of queries. Token streams have a pool of their own.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENT_QUERIES + 8, thread_name_prefix="service")
+    )
+    set_stream_concurrency(MAX_CONCURRENT_QUERIES)
+    backend = LocalChatBackend(batching=True)
+    yield
+    backend.close()
+
+
+app = FastAPI(title="Document Chat Service", lifespan=lifespan)
+
+
+class QueryRequest(BaseModel):
+    query: str
+    language: str = "en-IN"
+    stream: bool = True
+    namespace: Optional[str] = None
+
+
+def check_namespace(namespace: Optional[str]):
+    if namespace is not None and not is_valid_namespace(namespace):
+        raise HTTPException(status_code=400, detail="Invalid namespace: use 1-32 lowercase letters, digits, '-' or '_'")
+
+
+def overloaded(detail: str) -> JSONResponse:
+    metrics.inc("requests_shed")
+    return JSONResponse({"detail": detail}, status_code=503, headers={"Retry-After": "1"})
+
+
+def _acquire_query_slot() -> bool:
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= MAX_CONCURRENT_QUERIES:
+            return False
+        _in_flight += 1
+        return True
+
+
+def _release_query_slot():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+@app.post("/query")
+async def query(request: QueryRequest):
+    """Answer a question; with stream, as newline-delimited JSON events (delta ..., final)."""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    check_namespace(request.namespace)
+    if not _acquire_query_slot():
+        return overloaded("Too many queries in flight")
+
+    events = backend.astream(request.query, request.language, request.namespace)
+    try:
+        # The first event comes after embedding and retrieval, where an overload would surface;
+        # waiting for it here lets that still become a 503 rather than a broken stream
+        first = await events.__anext__()
+    except Overloaded as e:
+        await events.aclose()
+        _release_query_slot()
+        return overloaded(str(e))
+    except BaseException:
+        await events.aclose()
+        _release_query_slot()
+        raise
+
+    if not request.stream:
+        try:
+            final = first
+            async for event in events:
+                final = event
+        finally:
+            _release_query_slot()
+        return {"response": final.get("response", ""), "confidence": final.get("confidence", 0.0)}
+
+    async def body():
+        try:
+            yield json.dumps(first, ensure_ascii=False) + "\n"
+            async for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            await events.aclose()
+            _release_query_slot()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.post("/ingest")
+async def ingest(file: UploadFile = File(...), namespace: Optional[str] = Form(None),
+                 document_id: Optional[str] = Form(None)):
+    """
+    Queue an uploaded document for background ingestion into namespace; returns its job id.
+    A new upload with the same document_id (default: the file name) replaces the earlier one.
+    """
+    check_namespace(namespace)
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported file format: {extension}")
+    # Counted across all namespaces: the embedding worker is shared
+    pending = sum(job['status'] not in ('done', 'failed') for job in backend.ingestion_queue.jobs())
+    if pending >= MAX_PENDING_INGEST_JOBS:
+        return overloaded(f"{pending} documents are already waiting to be ingested")
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp_file:
+        while chunk := await file.read(1024 * 1024):
+            temp_file.write(chunk)
+        temp_path = temp_file.name
+    # Hashing reads the whole upload; keep it off the event loop
+    file_hash = await asyncio.to_thread(file_sha256, temp_path)
+    # The queue owns the temp file from here on and removes it once parsed
+    job_id = backend.submit(temp_path, file.filename, file_hash, namespace, document_id or file.filename)
+    return {"job_id": job_id}
+
+
+@app.get("/jobs")
+def jobs(ids: Optional[str] = None, namespace: Optional[str] = None):
+    check_namespace(namespace)
+    return {"jobs": backend.jobs(ids.split(",") if ids else None, namespace)}
+
+
+@app.get("/jobs/{job_id}")
+def job(job_id: str, namespace: Optional[str] = None):
+    check_namespace(namespace)
+    found = backend.jobs([job_id], namespace)
+    if not found:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return found[0]
+
+
+@app.get("/stats")
+def stats(namespace: Optional[str] = None):
+    check_namespace(namespace)
+    return {**backend.stats(namespace), 'queries_in_flight': _in_flight}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return metrics.render_prometheus()
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import `components` and `benchmarks` from the repository root, as the app and benchmarks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,83 @@
+import numpy as np
+
+from components.answer_cache import SemanticAnswerCache, identifiers
+
+QUERY = "What does clause 4.2 say about part P-2040?"
+
+
+def vector(*values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float32)
+
+
+class Corpus:
+    version = 1
+
+
+def make_cache(**kwargs):
+    corpus = Corpus()
+    return SemanticAnswerCache(version_getter=lambda: corpus.version, **kwargs), corpus
+
+
+def stored(cache, embedding=vector(1, 0, 0), language="en-IN", query=QUERY, response="answer"):
+    _, version = cache.lookup(embedding, language, query)
+    cache.store(embedding, language, query, response, 0.8, version)
+
+
+def test_identifiers_are_tokens_with_digits():
+    assert identifiers(QUERY) == {"4.2", "p-2040"}
+    assert identifiers("What is the warranty?") == frozenset()
+
+
+def test_hits_similar_queries_above_the_threshold():
+    cache, _ = make_cache(threshold=0.95)
+    stored(cache)
+
+    hit, _ = cache.lookup(vector(1, 0.1, 0), "en-IN", QUERY)
+    miss, _ = cache.lookup(vector(1, 1, 0), "en-IN", QUERY)
+
+    assert hit == {'response': "answer", 'confidence': 0.8}
+    assert miss is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_language_and_identifiers_must_match():
+    cache, _ = make_cache()
+    stored(cache)
+
+    assert cache.lookup(vector(1, 0, 0), "hi-IN", QUERY)[0] is None
+    assert cache.lookup(vector(1, 0, 0), "en-IN", "What does clause 4.3 say about part P-2040?")[0] is None
+
+
+def test_a_new_corpus_version_drops_the_cache():
+    cache, corpus = make_cache()
+    stored(cache)
+    corpus.version = 2
+
+    assert cache.lookup(vector(1, 0, 0), "en-IN", QUERY)[0] is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_answers_retrieved_before_a_version_change_are_not_stored():
+    cache, corpus = make_cache()
+    _, version = cache.lookup(vector(1, 0, 0), "en-IN", QUERY)
+    # Documents were ingested while the answer was being generated
+    corpus.version = 2
+    cache.store(vector(1, 0, 0), "en-IN", QUERY, "stale", 0.8, version)
+
+    assert cache.lookup(vector(1, 0, 0), "en-IN", QUERY)[0] is None
+    assert cache.stats()['stale_stores'] == 1
+
+
+def test_evicts_least_recently_used_and_expires_old_entries():
+    cache, _ = make_cache(max_entries=2)
+    stored(cache, vector(1, 0, 0), response="x")
+    stored(cache, vector(0, 1, 0), response="y")
+    cache.lookup(vector(1, 0, 0), "en-IN", QUERY)
+    stored(cache, vector(0, 0, 1), response="z")
+
+    assert cache.lookup(vector(0, 1, 0), "en-IN", QUERY)[0] is None
+    assert cache.lookup(vector(1, 0, 0), "en-IN", QUERY)[0]['response'] == "x"
+
+    cache.ttl_seconds = 0
+    assert cache.lookup(vector(1, 0, 0), "en-IN", QUERY)[0] is None
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,99 @@
+import os
+import time
+
+from components.chat_history import ChatHistory, prune_chat_logs
+
+
+def render(message):
+    return f"<p>{message['content']}</p>"
+
+
+def message(i):
+    return {'role': "user" if i % 2 == 0 else "assistant", 'content': f"message {i}"}
+
+
+def filled(path, count, max_buffered=3) -> ChatHistory:
+    history = ChatHistory(str(path), render, max_buffered=max_buffered)
+    for i in range(count):
+        history.append(message(i))
+    return history
+
+
+def test_keeps_only_the_latest_messages_in_memory(tmp_path):
+    history = filled(tmp_path / "chat.jsonl", 10)
+
+    assert len(history) == 10
+    assert history.recent(5) == [(message(i), render(message(i))) for i in range(7, 10)]
+    assert history.recent(2) == [(message(i), render(message(i))) for i in range(8, 10)]
+
+
+def test_pages_messages_from_log_and_buffer(tmp_path):
+    history = filled(tmp_path / "chat.jsonl", 10)
+
+    assert history.messages(0, 10) == [message(i) for i in range(10)]
+    assert history.messages(2, 5) == [message(i) for i in range(2, 5)]
+    assert history.messages(5, 9) == [message(i) for i in range(5, 9)]
+    assert history.messages(-3, 50) == [message(i) for i in range(10)]
+    assert history.messages(4, 4) == []
+
+
+def test_resumes_an_existing_log(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    filled(path, 6)
+
+    resumed = ChatHistory(str(path), render, max_buffered=3)
+    resumed.append(message(6))
+
+    assert len(resumed) == 7
+    assert resumed.recent(3) == [(message(i), render(message(i))) for i in range(4, 7)]
+    assert resumed.messages(0, 7) == [message(i) for i in range(7)]
+
+
+def test_resume_ignores_a_truncated_last_line(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    filled(path, 4)
+    with open(path, "ab") as f:
+        f.write(b'{"role": "user", "cont')
+
+    resumed = ChatHistory(str(path), render, max_buffered=3)
+
+    assert len(resumed) == 4
+    assert resumed.messages(0, 4) == [message(i) for i in range(4)]
+
+
+def test_appends_after_a_crash_survive_the_next_resume(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    filled(path, 3)
+    with open(path, "ab") as f:
+        f.write(b'{"role": "assistant", "content": "cut sh')
+
+    resumed = ChatHistory(str(path), render, max_buffered=2)
+    resumed.append(message(3))
+    resumed.append(message(4))
+
+    again = ChatHistory(str(path), render, max_buffered=2)
+    assert len(again) == 5
+    assert again.messages(0, 5) == [message(i) for i in range(5)]
+
+
+def test_clear_removes_the_log(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    history = filled(path, 3)
+    history.clear()
+
+    assert len(history) == 0
+    assert history.recent(5) == []
+    assert not path.exists()
+
+
+def test_prune_chat_logs_deletes_only_old_logs(tmp_path):
+    old, fresh, other = tmp_path / "old.jsonl", tmp_path / "fresh.jsonl", tmp_path / "notes.txt"
+    for path in (old, fresh, other):
+        path.write_text("{}\n")
+    long_ago = time.time() - 10 * 86400
+    os.utime(old, (long_ago, long_ago))
+    os.utime(other, (long_ago, long_ago))
+
+    assert prune_chat_logs(str(tmp_path), max_age_seconds=86400) == 1
+    assert not old.exists() and fresh.exists() and other.exists()
+    assert prune_chat_logs(str(tmp_path / "missing"), max_age_seconds=86400) == 0
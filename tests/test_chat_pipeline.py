@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("sarvamai")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("transformers")
+
+from components import chat_pipeline
+from components.chat_pipeline import astream_chatbot_response
+
+
+class SlowTranslator:
+    def __init__(self, delay: float = 0.3):
+        self.delay = delay
+        self.calls = 0
+
+    def translate_text(self, text, target_lang, source_lang="auto"):
+        self.calls += 1
+        time.sleep(self.delay)
+        return text.upper() if target_lang != "en-IN" else text
+
+
+class Retriever:
+    def embed_query(self, query):
+        return np.ones(4, dtype=np.float32)
+
+    def hybrid_search(self, query, k, query_embedding=None):
+        return [{'id': "a", 'content': "The pump is covered.", 'score': 0.8, 'metadata': {'source': "a.pdf"}}]
+
+
+class Generator:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def stream_response(self, query, docs):
+        yield from self.tokens
+
+
+class AnswerCache:
+    def __init__(self, hit=None):
+        self.hit = hit
+        self.stored = []
+
+    def lookup(self, query_embedding, language, query):
+        return self.hit, 7
+
+    def store(self, *args):
+        self.stored.append(args)
+
+
+def run(query, nlp, cache, tokens=(), language="hi-IN"):
+    async def collect():
+        return [event async for event in astream_chatbot_response(query, nlp, Retriever(), Generator(tokens),
+                                                                  cache, language)]
+    return asyncio.run(collect())
+
+
+def test_cache_hit_does_not_wait_for_the_query_translation():
+    nlp = SlowTranslator(delay=0.3)
+    cache = AnswerCache(hit={'response': "कैश्ड", 'confidence': 0.9})
+
+    async def first_event():
+        start = time.perf_counter()
+        async for event in astream_chatbot_response("पंप की वारंटी?", nlp, Retriever(), Generator(()), cache, "hi-IN"):
+            return event, time.perf_counter() - start
+
+    event, elapsed = asyncio.run(first_event())
+
+    assert event == {'type': 'delta', 'text': "कैश्ड"}
+    assert elapsed < 0.2
+
+
+def test_cache_miss_translates_streams_and_stores():
+    nlp = SlowTranslator(delay=0.0)
+    cache = AnswerCache()
+
+    events = run("पंप की वारंटी?", nlp, cache, tokens=["Covered. ", "Twelve ", "months.\n\n- ", "Claim", " soon."])
+
+    assert events[-1]['response'] == "COVERED. TWELVE MONTHS.\n\n- CLAIM SOON."
+    assert "".join(event['text'] for event in events if event['type'] == 'delta') == events[-1]['response']
+    # Stored against the corpus version the lookup saw
+    assert cache.stored[0][-1] == 7
+
+
+def test_translate_stream_keeps_paragraph_and_list_breaks():
+    async def tokens():
+        for token in ["Intro line.", "\n\n- first", " item\n- second item\nEnd.", " Done!"]:
+            yield token
+
+    async def collect():
+        return "".join([text async for text in chat_pipeline._translate_stream(tokens(), SlowTranslator(0.0), "hi-IN")])
+
+    assert asyncio.run(collect()) == "INTRO LINE.\n\n- FIRST ITEM\n- SECOND ITEM\nEND. DONE!"
+
+
+def test_stream_worker_stops_and_closes_the_source_when_the_consumer_leaves():
+    produced = []
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                produced.append(1)
+                time.sleep(0.01)
+                yield "token "
+        finally:
+            closed.set()
+
+    async def read_two():
+        tokens = chat_pipeline._iterate_in_thread(endless)
+        received = [await tokens.__anext__(), await tokens.__anext__()]
+        await tokens.aclose()
+        # Checked while the loop still runs, as it does in a long-lived server
+        stopped = await asyncio.to_thread(closed.wait, 1)
+        count = len(produced)
+        await asyncio.sleep(0.05)
+        return received, stopped, len(produced) - count
+
+    received, stopped, produced_after = asyncio.run(read_two())
+    assert received == ["token ", "token "]
+    assert stopped
+    assert produced_after == 0
+
+
+def test_abandoned_answer_stops_reading_the_llm_stream():
+    closed = threading.Event()
+
+    class EndlessGenerator:
+        def stream_response(self, query, docs):
+            try:
+                while True:
+                    time.sleep(0.01)
+                    yield "more "
+            finally:
+                closed.set()
+
+    async def first_delta():
+        events = astream_chatbot_response("warranty?", SlowTranslator(0.0), Retriever(), EndlessGenerator(),
+                                          AnswerCache(), "en-IN")
+        event = await events.__anext__()
+        await events.aclose()
+        return event, await asyncio.to_thread(closed.wait, 1)
+
+    event, stopped = asyncio.run(first_delta())
+    assert event == {'type': 'delta', 'text': "more "}
+    assert stopped
@@ -0,0 +1,66 @@
+from components.context_builder import make_token_counter, merge_adjacent, pack_context
+
+TEXT = "The pump warranty covers defects for twelve months. Claims must be raised within thirty days."
+
+
+def chunk(start, end, score, source="manual.pdf", page=1, positioned=True):
+    metadata = {'source': source, 'page': page}
+    if positioned:
+        metadata['start_index'] = start
+    return {'content': TEXT[start:end], 'metadata': metadata, 'score': score}
+
+
+def test_merges_overlapping_chunks_by_position():
+    blocks = merge_adjacent([chunk(40, 94, 0.2), chunk(0, 60, 0.9)])
+
+    assert len(blocks) == 1
+    assert blocks[0]['content'] == TEXT
+    assert blocks[0]['score'] == 0.9
+
+
+def test_joins_chunks_separated_by_stripped_whitespace():
+    blocks = merge_adjacent([chunk(0, 51, 0.5), chunk(52, 94, 0.4)])
+
+    assert [block['content'] for block in blocks] == [TEXT]
+
+
+def test_keeps_distant_chunks_and_other_pages_apart():
+    blocks = merge_adjacent([chunk(0, 20, 0.5), chunk(60, 94, 0.4), chunk(10, 40, 0.3, page=2)])
+
+    assert sorted(block['content'] for block in blocks) == sorted([TEXT[0:20], TEXT[60:94], TEXT[10:40]])
+
+
+def test_merges_unpositioned_chunks_on_repeated_text():
+    blocks = merge_adjacent([chunk(30, 94, 0.1, positioned=False), chunk(0, 60, 0.7, positioned=False)])
+
+    assert len(blocks) == 1
+    assert blocks[0]['content'] == TEXT
+    assert blocks[0]['score'] == 0.7
+
+
+def test_rrf_score_takes_precedence():
+    doc = chunk(0, 20, 0.9)
+    doc['rrf_score'] = 0.03
+
+    assert merge_adjacent([doc])[0]['score'] == 0.03
+
+
+def test_pack_context_orders_by_score_and_skips_what_does_not_fit():
+    count_words = lambda text: len(text.split())
+    docs = [
+        {'content': "short low", 'metadata': {'source': "/tmp/a.pdf", 'page': 1}, 'score': 0.1},
+        {'content': " ".join(["long"] * 50), 'metadata': {'source': "/tmp/b.pdf", 'page': 1}, 'score': 0.5},
+        {'content': "short high", 'metadata': {'source': "/tmp/c.pdf", 'page': 1}, 'score': 0.9},
+    ]
+
+    context = pack_context(docs, max_tokens=20, count_tokens=count_words)
+
+    assert context == "Source: c.pdf\nContent: short high\n---\nSource: a.pdf\nContent: short low\n---"
+
+
+def test_token_counter_estimates_without_a_tokenizer():
+    count = make_token_counter(None)
+
+    assert count("") == 0
+    assert count("abcd") == 1
+    assert count("abcde") == 2
@@ -0,0 +1,134 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("langchain")
+pytest.importorskip("sentence_transformers")
+
+from langchain_core.documents import Document
+
+from components import document_processor
+from components.document_processor import DocumentProcessor
+
+
+class Encoder:
+    """Deterministic stand-in for the embedding model that counts what it embeds."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.encoded.extend(texts)
+        return np.stack([
+            np.frombuffer(hashlib.sha256(text.encode('utf-8')).digest()[:8], dtype=np.uint8).astype(np.float32)
+            for text in texts
+        ])
+
+
+class Splitter:
+    def split_documents(self, documents):
+        return [Document(page_content=part, metadata=dict(document.metadata))
+                for document in documents for part in document.page_content.split("\n\n")]
+
+
+@pytest.fixture
+def make_processor(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, "get_embedding_model", Encoder)
+    monkeypatch.setattr(document_processor, "make_text_splitter", Splitter)
+    processors = []
+
+    def make(**kwargs):
+        processor = DocumentProcessor(persist_directory=str(tmp_path), vector_backend="float16", **kwargs)
+        processors.append(processor)
+        return processor
+
+    yield make
+    for processor in processors:
+        processor.close()
+
+
+@pytest.fixture
+def processor(make_processor):
+    return make_processor()
+
+
+def chunks(*texts):
+    return [Document(page_content=text, metadata={}) for text in texts]
+
+
+def stored_versions(processor, document_id):
+    return sorted(metadata['file_hash'] for _, metadata in processor.vector_index.get_by_document(document_id))
+
+
+def test_a_new_version_replaces_the_stale_chunks_of_its_document(processor):
+    processor.ingest_chunks(chunks("intro", "clause 1"), "report.pdf", "v1", document_id="alice/report.pdf")
+    stats = processor.ingest_chunks(chunks("intro", "clause 2"), "report.pdf", "v2", document_id="alice/report.pdf")
+
+    assert stats['new_chunks'] == 1
+    assert stats['removed_chunks'] == 1
+    assert processor.embedding_model.encoded == ["intro", "clause 1", "clause 2"]
+    assert stored_versions(processor, "alice/report.pdf") == ["v2", "v2"]
+
+
+def test_same_named_uploads_of_different_documents_keep_their_chunks(processor):
+    processor.ingest_chunks(chunks("alice's report"), "report.pdf", "a", document_id="alice/report.pdf")
+    stats = processor.ingest_chunks(chunks("bob's report"), "report.pdf", "b", document_id="bob/report.pdf")
+
+    assert stats['removed_chunks'] == 0
+    assert stored_versions(processor, "alice/report.pdf") == ["a"]
+    assert stored_versions(processor, "bob/report.pdf") == ["b"]
+    assert processor.vector_index.count() == 2
+
+
+def test_identical_content_is_not_embedded_again_even_after_a_restart(make_processor):
+    processor = make_processor()
+    processor.ingest_chunks(chunks("intro", "clause 1"), "report.pdf", "v1")
+    processor.close()
+
+    reopened = make_processor()
+    stats = reopened.ingest_chunks(chunks("intro", "clause 1"), "report.pdf", "v1")
+
+    assert stats['new_chunks'] == 0
+    assert reopened.embedding_model.encoded == []
+    assert reopened.vector_index.count() == 2
+
+
+class Pages:
+    """Stand-in for iter_page_chunks over a three-page file, optionally failing at one page."""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.start_pages = []
+
+    def __call__(self, file_path, text_splitter=None, start_page=0):
+        self.start_pages.append(start_page)
+        for page_number, texts in enumerate([("page 0a", "page 0b"), ("page 1",), ("page 2",)]):
+            if page_number < start_page:
+                continue
+            if page_number == self.fail_at:
+                raise RuntimeError("worker killed")
+            yield page_number, chunks(*texts)
+
+
+def test_interrupted_ingestion_resumes_after_the_last_stored_page(make_processor, monkeypatch):
+    processor = make_processor(store_batch_size=1)
+    monkeypatch.setattr(document_processor, "iter_page_chunks", Pages(fail_at=2))
+    with pytest.raises(RuntimeError):
+        processor.ingest_document("report.pdf", file_hash="v1")
+    assert processor.embedding_model.encoded == ["page 0a", "page 0b", "page 1"]
+
+    pages = Pages()
+    monkeypatch.setattr(document_processor, "iter_page_chunks", pages)
+    stats = processor.ingest_document("report.pdf", file_hash="v1")
+
+    assert pages.start_pages == [2]
+    assert processor.embedding_model.encoded[3:] == ["page 2"]
+    # Chunks stored before the interruption are not stale
+    assert stats['removed_chunks'] == 0
+    assert processor.vector_index.count() == 4
+
+    # Once finished, the file is ingested from the start again
+    processor.ingest_document("report.pdf", file_hash="v1")
+    assert pages.start_pages == [2, 0]
@@ -0,0 +1,185 @@
+import time
+
+import httpx
+import pytest
+import requests
+
+from benchmarks.fake_services import run_fake_services
+from components.http_client import CircuitOpenError, ResilientHTTPClient
+
+
+@pytest.fixture
+def server():
+    with run_fake_services(llm_first_token=0.0, llm_token=0.0, translate=0.0) as server:
+        yield server
+
+
+def make_client(**kwargs) -> ResilientHTTPClient:
+    kwargs.setdefault("timeout", 5.0)
+    kwargs.setdefault("backoff_base", 0.01)
+    return ResilientHTTPClient("test", **kwargs)
+
+
+def generate(client: ResilientHTTPClient, server, **kwargs):
+    return client.post(f"{server.url}/models/fake-llm", endpoint="generate", json={"inputs": "hi"}, **kwargs)
+
+
+def test_retries_gateway_errors_until_success(server):
+    client = make_client(max_retries=3)
+    server.fail_next(502, times=2)
+
+    response = generate(client, server)
+
+    assert response.status_code == 200
+    assert server.requests == 3
+    assert client.breaker.state == "closed"
+
+
+def test_returns_last_error_once_retries_are_exhausted(server):
+    client = make_client(max_retries=2)
+    server.fail_next(504, times=5)
+
+    response = generate(client, server)
+
+    assert response.status_code == 504
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried(server):
+    client = make_client(max_retries=3)
+    server.fail_next(400)
+
+    assert generate(client, server).status_code == 400
+    assert server.requests == 1
+
+
+def test_honours_retry_after(server):
+    client = make_client(max_retries=1)
+    server.fail_next(429, headers={"Retry-After": "1"})
+
+    start = time.perf_counter()
+    response = generate(client, server)
+
+    assert response.status_code == 200
+    # Backoff alone would wait ~10 ms; Retry-After asks for a second, less 10% jitter
+    assert time.perf_counter() - start >= 0.85
+
+
+def test_waits_for_estimated_time_of_loading_model(server):
+    client = make_client(max_retries=1)
+    server.fail_next(503, payload={"error": "Model is loading", "estimated_time": 0.5})
+
+    start = time.perf_counter()
+    assert generate(client, server).status_code == 200
+    assert time.perf_counter() - start >= 0.4
+
+
+def test_breaker_counts_one_failure_per_call(server):
+    client = make_client(max_retries=2, failure_threshold=2)
+    server.fail_next(502, times=3)
+
+    assert generate(client, server).status_code == 502
+    assert server.requests == 3
+    assert client.breaker.failures == 1
+    assert client.breaker.state == "closed"
+
+
+def test_breaker_opens_after_repeated_server_errors(server):
+    client = make_client(max_retries=0, failure_threshold=2, reset_timeout=60)
+    server.fail_next(500, times=2)
+    generate(client, server)
+    generate(client, server)
+
+    with pytest.raises(CircuitOpenError):
+        generate(client, server)
+    # Short-circuited calls never reach the service
+    assert server.requests == 2
+
+
+def test_breaker_lets_a_trial_call_through_after_reset_timeout(server):
+    client = make_client(max_retries=0, failure_threshold=1, reset_timeout=0.2)
+    server.fail_next(500)
+    generate(client, server)
+    assert client.breaker.state == "open"
+
+    time.sleep(0.25)
+    assert generate(client, server).status_code == 200
+    assert client.breaker.state == "closed"
+
+
+def test_model_loading_and_throttling_do_not_open_the_breaker(server):
+    client = make_client(max_retries=0, failure_threshold=1)
+    server.fail_next(503, payload={"error": "Model is loading", "estimated_time": 20.0})
+    server.fail_next(429)
+
+    assert generate(client, server).status_code == 503
+    assert generate(client, server).status_code == 429
+    assert client.breaker.state == "closed"
+    assert generate(client, server).status_code == 200
+
+
+def test_streamed_response_holds_its_slot_until_closed(server):
+    client = make_client(max_concurrency=1)
+    response = client.post(f"{server.url}/models/fake-llm", endpoint="generate_stream",
+                           json={"inputs": "hi", "stream": True}, stream=True)
+
+    assert not client._semaphore.acquire(blocking=False)
+    with response:
+        assert sum(1 for line in response.iter_lines() if line.startswith(b"data:")) > 0
+    assert client._semaphore.acquire(blocking=False)
+    client._semaphore.release()
+
+    # Closing again must not release the slot a second time (the bounded semaphore would raise)
+    response.close()
+
+
+def test_plain_response_releases_its_slot(server):
+    client = make_client(max_concurrency=1)
+    server.fail_next(502)
+
+    assert generate(client, server).status_code == 200
+    assert client._semaphore.acquire(blocking=False)
+    client._semaphore.release()
+
+
+def test_call_raises_other_errors_at_once_without_tripping_the_breaker():
+    client = make_client(max_retries=3, failure_threshold=1)
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise TypeError("bad argument")
+
+    for _ in range(2):
+        with pytest.raises(TypeError):
+            client.call("sdk", broken)
+    assert len(calls) == 2
+    assert client.breaker.state == "closed"
+
+
+def test_call_retries_network_errors_and_status_errors():
+    client = make_client(max_retries=3)
+    failures = [requests.ConnectionError("reset"), httpx.ReadTimeout("slow"), StatusError(503)]
+
+    def flaky():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert client.call("sdk", flaky) == "ok"
+    assert client.breaker.failures == 0
+
+
+def test_unreachable_service_counts_against_the_breaker():
+    client = make_client(max_retries=1, failure_threshold=1, timeout=1.0)
+
+    with pytest.raises(requests.ConnectionError):
+        # Nothing listens on the discard port
+        client.post("http://127.0.0.1:9/generate", endpoint="generate")
+    assert client.breaker.state == "open"
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("langchain")
+pytest.importorskip("sentence_transformers")
+
+from components.ingestion_worker import IngestionQueue
+
+
+class BrokenNamespaces:
+    """Every write fails, so jobs finish straight away."""
+
+    @contextmanager
+    def use(self, name=None):
+        raise OSError("disk full")
+        yield
+
+
+def upload(tmp_path, name: str, content: bytes = b"text") -> str:
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def wait_until_idle(ingestion: IngestionQueue, job_ids):
+    deadline = time.monotonic() + 5
+    while any(job['status'] not in ('done', 'failed') for job in ingestion.jobs(job_ids)):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(**kwargs):
+        # Everything goes through the embedding thread, so no parser processes are started
+        ingestion = IngestionQueue(BrokenNamespaces(), max_workers=1, stream_threshold_bytes=-1, **kwargs)
+        queues.append(ingestion)
+        return ingestion
+
+    yield make
+    for ingestion in queues:
+        ingestion.shutdown()
+
+
+def test_finished_jobs_are_kept_until_their_ttl(tmp_path, make_queue):
+    ingestion = make_queue(finished_ttl=60)
+    job_id = ingestion.submit(upload(tmp_path, "a.txt"), "a.txt", "hash-a")
+    wait_until_idle(ingestion, [job_id])
+
+    job = ingestion.jobs([job_id])[0]
+    assert job['status'] == 'failed'
+    assert job['error'] == "disk full"
+    assert job['finished_at'] is not None
+
+
+def test_finished_jobs_are_forgotten_after_their_ttl(tmp_path, make_queue):
+    ingestion = make_queue(finished_ttl=0)
+    job_id = ingestion.submit(upload(tmp_path, "a.txt"), "a.txt", "hash-a")
+    wait_until_idle(ingestion, [job_id])
+
+    assert ingestion.jobs() == []
+    # The same content can be queued again once its job is forgotten
+    assert ingestion.submit(upload(tmp_path, "a.txt"), "a.txt", "hash-a") != job_id
+
+
+def test_keeps_at_most_max_finished_jobs(tmp_path, make_queue):
+    ingestion = make_queue(max_finished=2)
+    job_ids = [ingestion.submit(upload(tmp_path, f"{i}.txt"), f"{i}.txt", f"hash-{i}") for i in range(4)]
+    wait_until_idle(ingestion, job_ids)
+
+    assert [job['id'] for job in ingestion.jobs()] == job_ids[2:]
@@ -0,0 +1,68 @@
+from components.keyword_index import BM25Index, tokenize
+
+DOCS = {
+    "pump": "The pump warranty covers defects for twelve months.",
+    "claims": "Claims must be raised within thirty days of the failure.",
+    "parts": "Part numbers are listed in the supplier agreement for the pump.",
+}
+
+
+def build(path=None) -> BM25Index:
+    index = BM25Index(path)
+    index.add(list(DOCS), list(DOCS.values()))
+    return index
+
+
+def test_tokenize_keeps_indic_words_whole():
+    assert tokenize("पंप की वारंटी, Clause 4") == ["पंप", "की", "वारंटी", "clause", "4"]
+
+
+def test_search_ranks_by_bm25():
+    index = build()
+
+    results = index.search("pump warranty", k=5)
+
+    assert [doc_id for doc_id, _ in results] == ["pump", "parts"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_search_limits_to_k_and_ignores_unknown_terms():
+    index = build()
+
+    assert len(index.search("the pump", k=1)) == 1
+    assert index.search("turbine") == []
+    assert index.search("") == []
+
+
+def test_add_skips_indexed_ids():
+    index = build()
+    index.add(["pump"], ["something else entirely"])
+
+    assert len(index) == 3
+    assert index.search("something") == []
+
+
+def test_removed_chunks_are_not_returned():
+    index = build()
+    index.remove(["pump", "missing"])
+
+    assert len(index) == 2
+    assert "pump" not in index
+    assert [doc_id for doc_id, _ in index.search("pump warranty")] == ["parts"]
+
+    # A removed id can be indexed again
+    index.add(["pump"], ["replacement pump"])
+    assert "pump" in index
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "bm25.pkl")
+    index = build(path)
+    index.remove(["claims"])
+    index.save()
+
+    loaded = BM25Index(path)
+
+    assert len(loaded) == 2
+    assert loaded.search("pump warranty") == index.search("pump warranty")
+    assert loaded.search("thirty days") == []
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("sarvamai")
+
+from components.nlp_processor import NLPProcessor
+
+
+@pytest.fixture(scope="module")
+def detect():
+    # detect_language is offline; skip the constructor, which sets up the Sarvam client
+    return NLPProcessor.__new__(NLPProcessor).detect_language
+
+
+@pytest.mark.parametrize("text, language", [
+    ("What does the warranty cover?", "en-IN"),
+    ("Please explain clause 4.2 of the agreement", "en-IN"),
+    ("पंप की वारंटी कितनी है?", "hi-IN"),
+    ("मुझे दावा कैसे करना है", "hi-IN"),
+    ("पंपाची वॉरंटी किती आहे?", "mr-IN"),
+    ("मला दावा कसा करायचा ते सांगा", "mr-IN"),
+    ("शाळेच्या वेळा", "mr-IN"),
+    ("পাম্পের ওয়ারেন্টি কত?", "bn-IN"),
+    ("பம்ப் உத்தரவாதம் என்ன?", "ta-IN"),
+    ("ಪಂಪ್ ವಾರಂಟಿ ಏನು?", "kn-IN"),
+])
+def test_detects_language(detect, text, language):
+    assert detect(text) == language
+
+
+@pytest.mark.parametrize("text", [
+    # Romanized Hindi and Marathi are left to Sarvam rather than taken for English
+    "mujhe pump ki warranty batao",
+    "warranty kitni hai",
+    "mala warranty kay aahe te sanga",
+    # Devanagari without telling words, mixed scripts, and text without letters
+    "पंप वारंटी",
+    "pump वारंटी की शर्तें and clause",
+    "12345 ?!",
+    "",
+])
+def test_unclear_text_is_left_to_auto_detection(detect, text):
+    assert detect(text) is None
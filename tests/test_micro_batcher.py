@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from components.micro_batcher import MicroBatcher, Overloaded
+
+
+def test_concurrent_calls_are_batched_and_get_their_own_results():
+    sizes = []
+
+    def double(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, "test", max_batch_size=8, max_wait=0.05)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(batcher, range(16)))
+    finally:
+        batcher.close()
+
+    assert results == [item * 2 for item in range(16)]
+    assert max(sizes) > 1
+    assert max(sizes) <= 8
+
+
+def test_batch_errors_fail_every_caller_in_the_batch():
+    def broken(items):
+        raise KeyError("boom")
+
+    batcher = MicroBatcher(broken, "test", max_wait=0.05)
+    futures = [batcher.submit(i) for i in range(3)]
+    batcher.close()
+
+    for future in futures:
+        with pytest.raises(KeyError):
+            future.result(timeout=1)
+
+
+def test_too_few_results_fail_the_batch_instead_of_hanging():
+    batcher = MicroBatcher(lambda items: items[:1], "test", max_wait=0.05)
+    futures = [batcher.submit(i) for i in range(3)]
+    batcher.close()
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=1)
+
+
+def test_rejects_work_beyond_max_pending():
+    release = threading.Event()
+
+    def blocked(items):
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(blocked, "test", max_batch_size=1, max_wait=0, max_pending=2)
+    try:
+        running = batcher.submit("running")
+        # Let the worker take the first item, so only the next ones count as waiting
+        while batcher.pending:
+            time.sleep(0.001)
+        waiting = [batcher.submit(i) for i in range(2)]
+        with pytest.raises(Overloaded):
+            batcher.submit("one too many")
+    finally:
+        release.set()
+        batcher.close()
+    assert running.result(timeout=1) == "running"
+    assert [future.result(timeout=1) for future in waiting] == [0, 1]
+
+
+def test_items_submitted_before_close_are_processed_and_later_ones_refused():
+    batcher = MicroBatcher(lambda items: items, "test", max_wait=0.05)
+    future = batcher.submit("early")
+    batcher.close()
+    batcher.close()
+
+    assert future.result(timeout=1) == "early"
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
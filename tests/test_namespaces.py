@@ -0,0 +1,103 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("langchain")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("transformers")
+
+from langchain_core.documents import Document
+
+from components import document_processor, retrieval_system
+from components.namespaces import LAST_USED_FILE, NamespaceManager
+
+
+class Encoder:
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class Splitter:
+    def split_documents(self, documents):
+        return documents
+
+
+@pytest.fixture
+def make_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, "get_embedding_model", Encoder)
+    monkeypatch.setattr(document_processor, "make_text_splitter", Splitter)
+    monkeypatch.setattr(retrieval_system, "get_embedding_model", Encoder)
+    managers = []
+
+    def make(**kwargs):
+        manager = NamespaceManager(str(tmp_path), vector_backend="float16", **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def ingest(manager, name, *texts):
+    with manager.use(name) as namespace:
+        namespace.doc_processor.ingest_chunks([Document(page_content=text, metadata={}) for text in texts],
+                                              f"{name}.txt", name)
+
+
+def test_namespaces_exist_once_acquired(make_manager):
+    manager = make_manager()
+
+    assert manager.exists(None)
+    assert not manager.exists("alice")
+    assert not manager.exists("../alice")
+    with pytest.raises(ValueError):
+        manager.acquire("../alice")
+
+    with manager.use("alice"):
+        pass
+    assert manager.exists("alice")
+
+
+def test_least_recently_used_idle_namespaces_are_closed_beyond_max_open(make_manager):
+    manager = make_manager(max_open=1)
+    ingest(manager, "alice", "alice's notes")
+
+    with manager.use("alice") as alice:
+        # Pinned namespaces stay open even beyond the budget
+        with manager.use("bob"):
+            assert manager.stats()['open'] == 2
+        assert manager.stats()['open'] == 1
+        assert manager.stats()['evictions'] == 1
+        assert alice.chunks == 1
+
+    # Closed namespaces keep their data on disk and reopen with it
+    with manager.use("bob"):
+        pass
+    with manager.use("alice") as alice:
+        assert alice.chunks == 1
+    assert manager.stats()['evictions'] == 3
+
+
+def test_idle_namespaces_are_closed_beyond_max_resident_chunks(make_manager):
+    manager = make_manager(max_resident_chunks=2)
+    ingest(manager, "alice", "one", "two")
+    ingest(manager, "bob", "three")
+
+    assert manager.stats() == {'open': 1, 'resident_chunks': 1, 'evictions': 1, 'expired': 0}
+
+
+def test_prune_deletes_namespaces_unused_for_max_idle_seconds(make_manager, tmp_path):
+    manager = make_manager(max_open=1, max_idle_seconds=3600)
+    ingest(manager, "stale", "old notes")
+    ingest(manager, "fresh", "new notes")
+    long_ago = time.time() - 7200
+    os.utime(tmp_path / "namespaces" / "stale" / LAST_USED_FILE, (long_ago, long_ago))
+
+    assert manager.prune() == 1
+    assert not manager.exists("stale")
+    assert manager.exists("fresh")
+    assert manager.stats()['expired'] == 1
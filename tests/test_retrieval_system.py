@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("transformers")
+
+from components.keyword_index import BM25Index
+from components.retrieval_system import DocumentRetriever
+from components.vector_index import MemmapVectorIndex
+
+CHUNKS = {
+    "near": ("General warranty terms for the pump.", [1.0, 0.0, 0.0, 0.0]),
+    "close": ("Warranty claims go through the supplier.", [0.9, 0.1, 0.0, 0.0]),
+    "part": ("Replacement part P-2040 ships within a week.", [0.0, 0.0, 1.0, 0.0]),
+}
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    vector_index = MemmapVectorIndex(str(tmp_path))
+    ids = list(CHUNKS)
+    vector_index.upsert(ids, np.array([CHUNKS[i][1] for i in ids]), [CHUNKS[i][0] for i in ids],
+                        [{'source': f"{i}.pdf"} for i in ids])
+    keyword_index = BM25Index()
+    keyword_index.add(ids, [CHUNKS[i][0] for i in ids])
+    # Query embeddings are passed in, so the embedding model is never loaded
+    retriever = DocumentRetriever.__new__(DocumentRetriever)
+    retriever.vector_index, retriever.keyword_index = vector_index, keyword_index
+    retriever._embed_batcher = retriever._query_batcher = None
+    return retriever
+
+
+def test_keyword_hits_outside_the_vector_top_k_are_fused_in(retriever):
+    query_embedding = np.array([1.0, 0.0, 0.0, 0.0])
+
+    vector_only = retriever.similarity_search("part P-2040", k=2, query_embedding=query_embedding)
+    fused = retriever.hybrid_search("part P-2040", k=2, fetch_k=2, query_embedding=query_embedding)
+
+    assert [doc['id'] for doc in vector_only] == ["near", "close"]
+    assert "part" in [doc['id'] for doc in fused]
+    part = next(doc for doc in fused if doc['id'] == "part")
+    # Fetched by id and scored against the query like the vector hits
+    assert part['content'] == CHUNKS["part"][0]
+    assert part['score'] == pytest.approx(0.0, abs=0.01)
+
+
+def test_chunks_found_by_both_rankers_come_first(retriever):
+    fused = retriever.hybrid_search("warranty pump", k=3, query_embedding=np.array([1.0, 0.0, 0.0, 0.0]))
+
+    assert fused[0]['id'] == "near"
+    assert fused[0]['rrf_score'] == pytest.approx(2 / 61)
+    assert [doc['rrf_score'] for doc in fused] == sorted((doc['rrf_score'] for doc in fused), reverse=True)
+
+
+def test_falls_back_to_vector_search_without_keyword_hits(retriever):
+    retriever.keyword_index = BM25Index()
+
+    results = retriever.hybrid_search("anything", k=1, query_embedding=np.array([0.0, 0.0, 1.0, 0.0]))
+
+    assert [doc['id'] for doc in results] == ["part"]
+    assert 'rrf_score' not in results[0]
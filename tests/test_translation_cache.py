@@ -0,0 +1,52 @@
+from components.translation_cache import TranslationCache
+
+
+def test_memory_then_disk_hits(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    cache = TranslationCache(path)
+    cache.put("Hello", "en-IN", "hi-IN", "नमस्ते")
+
+    assert cache.get("Hello", "en-IN", "hi-IN") == "नमस्ते"
+    assert cache.get("Hello", "en-IN", "ta-IN") is None
+
+    # A new process starts with an empty memory tier and finds the entry on disk
+    reopened = TranslationCache(path)
+    assert reopened.get("Hello", "en-IN", "hi-IN") == "नमस्ते"
+    assert reopened.get("Hello", "en-IN", "hi-IN") == "नमस्ते"
+    assert reopened.stats()['disk_hits'] == 1
+    assert reopened.stats()['memory_hits'] == 1
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = TranslationCache(None, max_memory_bytes=10)
+    cache.put("a", "en-IN", "hi-IN", "xxxx")
+    cache.put("b", "en-IN", "hi-IN", "yyyy")
+    cache.get("a", "en-IN", "hi-IN")
+    cache.put("c", "en-IN", "hi-IN", "zzzz")
+
+    assert cache.get("b", "en-IN", "hi-IN") is None
+    assert cache.get("a", "en-IN", "hi-IN") == "xxxx"
+    assert cache.stats()['memory_bytes'] <= 10
+
+
+def test_disk_tier_stays_within_its_budget(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    cache = TranslationCache(path, max_memory_bytes=1, max_disk_bytes=100)
+    for i in range(30):
+        cache.put(f"text {i}", "en-IN", "hi-IN", "x" * 10)
+
+    assert cache.stats()['disk_bytes'] <= 100
+    assert TranslationCache(path).stats()['disk_bytes'] == cache.stats()['disk_bytes']
+    # The most recent entries survive
+    assert cache.get("text 29", "en-IN", "hi-IN") == "x" * 10
+    assert cache.get("text 0", "en-IN", "hi-IN") is None
+
+
+def test_replacing_an_entry_does_not_double_count_it(tmp_path):
+    cache = TranslationCache(str(tmp_path / "translations.sqlite3"))
+    cache.put("Hello", "en-IN", "hi-IN", "one")
+    cache.put("Hello", "en-IN", "hi-IN", "three")
+
+    assert cache.get("Hello", "en-IN", "hi-IN") == "three"
+    assert cache.stats()['memory_bytes'] == 5
+    assert cache.stats()['disk_bytes'] == 5
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+
+from components.vector_index import MemmapVectorIndex
+
+DIM = 8
+
+
+def unit(i: int) -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+def add(index: MemmapVectorIndex, *positions: int):
+    ids = [f"doc-{i}" for i in positions]
+    index.upsert(ids, np.stack([unit(i) for i in positions]), [f"text {i}" for i in positions],
+                 [{'source': f"file-{i}.pdf", 'page': i} for i in positions])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+@pytest.mark.parametrize("rescore", [True, False])
+def test_query_finds_nearest(tmp_path, dtype, rescore):
+    index = MemmapVectorIndex(str(tmp_path), dtype=dtype, rescore=rescore)
+    add(index, 0, 1, 2)
+
+    hits = index.query(unit(1) + 0.1 * unit(2), k=2)
+
+    assert [hit['id'] for hit in hits] == ["doc-1", "doc-2"]
+    assert hits[0]['content'] == "text 1"
+    assert hits[0]['metadata'] == {'source': "file-1.pdf", 'page': 1}
+    assert hits[0]['score'] == pytest.approx(0.995, abs=0.01)
+
+
+def test_query_many_matches_single_queries(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path), block_rows=2)
+    add(index, 0, 1, 2, 3, 4)
+
+    batched = index.query_many(np.stack([unit(3), unit(0)]), k=1)
+
+    assert [hits[0]['id'] for hits in batched] == ["doc-3", "doc-0"]
+    assert batched[0] == index.query(unit(3), k=1)
+
+
+def test_upsert_replaces_existing_ids(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path))
+    add(index, 0, 1)
+    index.upsert(["doc-0"], unit(5)[None, :], ["moved"], [{'source': "file-0.pdf"}])
+
+    assert index.count() == 2
+    hit = index.query(unit(5), k=1)[0]
+    assert (hit['id'], hit['content']) == ("doc-0", "moved")
+
+
+def test_deleted_chunks_are_not_returned(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path))
+    add(index, 0, 1)
+    index.delete(["doc-0"])
+
+    assert index.count() == 1
+    assert [hit['id'] for hit in index.query(unit(0), k=5)] == ["doc-1"]
+
+
+def test_reopens_from_disk(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path), dtype="int8")
+    add(index, 0, 1, 2)
+    index.close()
+
+    reopened = MemmapVectorIndex(str(tmp_path), dtype="int8")
+    assert reopened.count() == 3
+    assert reopened.query(unit(2), k=1)[0]['id'] == "doc-2"
+    assert reopened.get(["doc-1", "missing"], unit(1))["doc-1"]['score'] == pytest.approx(1.0, abs=0.01)
+
+
+def test_rejects_mismatched_dtype_and_dimension(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path), dtype="float16")
+    add(index, 0)
+    with pytest.raises(ValueError):
+        index.upsert(["wide"], np.ones((1, DIM + 1)), ["wide"], [{}])
+    index.close()
+
+    with pytest.raises(ValueError):
+        MemmapVectorIndex(str(tmp_path), dtype="int8")
+
+
+def test_rows_added_without_rescoring_disable_it_for_good(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path), rescore=True)
+    add(index, 0)
+    index.close()
+
+    # Rows written now get no full-precision copy ...
+    index = MemmapVectorIndex(str(tmp_path), rescore=False)
+    add(index, 1)
+    index.close()
+
+    # ... so re-scoring must stay off, or those rows would score against zeros
+    index = MemmapVectorIndex(str(tmp_path), rescore=True)
+    assert not index.rescore
+    hit = index.query(unit(1), k=1)[0]
+    assert hit['id'] == "doc-1"
+    assert hit['score'] == pytest.approx(1.0, abs=0.01)
+
+
+def test_get_by_document_keys_on_the_document_id(tmp_path):
+    index = MemmapVectorIndex(str(tmp_path))
+    index.upsert(["a", "b", "legacy"], np.stack([unit(0), unit(1), unit(2)]), ["a", "b", "legacy"], [
+        {'source': "report.pdf", 'document_id': "alice/report.pdf"},
+        {'source': "report.pdf", 'document_id': "bob/report.pdf"},
+        # Stored before chunks recorded their document: it belongs to its file name
+        {'source': "report.pdf"},
+    ])
+
+    assert [doc_id for doc_id, _ in index.get_by_document("alice/report.pdf")] == ["a"]
+    assert [doc_id for doc_id, _ in index.get_by_document("report.pdf")] == ["legacy"]